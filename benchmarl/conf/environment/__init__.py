@@ -11,7 +11,7 @@ import os.path as osp
 from enum import Enum
 from typing import Any, Callable, Dict, List, Optional
 
-from benchmarl.lib.utils import DEVICE_TYPING
+from benchmarl.lib.utils import _class_from_name, _LazyRegistry, DEVICE_TYPING
 
 from tensordict import TensorDictBase
 from torchrl.data import CompositeSpec
@@ -19,6 +19,11 @@ from torchrl.envs import EnvBase, RewardSum, Transform
 
 
 def _load_config(name: str, config: Dict[str, Any]):
+    from .task_index import TASK_CONFIGS
+
+    if name in TASK_CONFIGS:
+        return _class_from_name(TASK_CONFIGS[name])(**config).__dict__
+
     if not name.endswith(".py"):
         name += ".py"
 
@@ -255,16 +260,26 @@ class Task(Enum):
         return self.__repr__()
 
 
-# This is a registry mapping "envname/task_name" to the EnvNameTask.TASK_NAME enum
-# It is used by automatically load task enums from yaml files
+def _task_from_name(name: str) -> Task:
+    enum_name, member_name = name.rsplit(".", 1)
+    return _class_from_name(enum_name)[member_name]
+
+
+# This is a registry mapping "envname.task_name" to the EnvNameTask.TASK_NAME enum
+# It is built from the static task index, so environments are only imported when one of their tasks is used
+
+from .task_index import TASK_ENUMS
+
+task_config_registry = _LazyRegistry(TASK_ENUMS, loader=_task_from_name)
+
+_env_tasks = {
+    "PettingZooTask": "benchmarl.conf.environment.pettingzoo.PettingZooTask",
+    "Smacv2Task": "benchmarl.conf.environment.smacv2.Smacv2Task",
+    "VmasTask": "benchmarl.conf.environment.vmas.VmasTask",
+}
 
-from .pettingzoo import PettingZooTask
-from .smacv2 import Smacv2Task
-from .vmas import VmasTask
 
-task_config_registry = {}
-for env in [VmasTask, Smacv2Task, PettingZooTask]:
-    env_config_registry = {
-        f"{env.env_name()}.{task.name.lower()}": task for task in env
-    }
-    task_config_registry.update(env_config_registry)
+def __getattr__(name: str):
+    if name in _env_tasks:
+        return _class_from_name(_env_tasks[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -10,7 +10,7 @@ from benchmarl.conf.environment import Task
 from benchmarl.lib.utils import DEVICE_TYPING
 
 from torchrl.data import CompositeSpec
-from torchrl.envs import EnvBase, PettingZooEnv
+from torchrl.envs import EnvBase
 
 
 class PettingZooTask(Task):
@@ -37,6 +37,8 @@ class PettingZooTask(Task):
         if self.supports_continuous_actions() and self.supports_discrete_actions():
             self.config.update({"continuous_actions": continuous_actions})
 
+        from torchrl.envs import PettingZooEnv
+
         return lambda: PettingZooEnv(
             categorical_actions=True,
             device=device,
@@ -13,7 +13,6 @@ from benchmarl.lib.utils import DEVICE_TYPING
 from tensordict import TensorDictBase
 from torchrl.data import CompositeSpec
 from torchrl.envs import EnvBase
-from torchrl.envs.libs.smacv2 import SMACv2Env
 
 
 class Smacv2Task(Task):
@@ -42,6 +41,8 @@ class Smacv2Task(Task):
         seed: Optional[int],
         device: DEVICE_TYPING,
     ) -> Callable[[], EnvBase]:
+        from torchrl.envs.libs.smacv2 import SMACv2Env
+
         return lambda: SMACv2Env(
             categorical_actions=True, seed=seed, device=device, **self.config
         )
@@ -0,0 +1,86 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+# This file is generated by scripts/generate_task_index.py, do not edit it manually.
+
+# Maps task keys to the import path of their task enum member
+TASK_ENUMS = {
+    "pettingzoo.multiwalker": "benchmarl.conf.environment.pettingzoo.PettingZooTask.MULTIWALKER",
+    "pettingzoo.waterworld": "benchmarl.conf.environment.pettingzoo.PettingZooTask.WATERWORLD",
+    "pettingzoo.simple_adversary": "benchmarl.conf.environment.pettingzoo.PettingZooTask.SIMPLE_ADVERSARY",
+    "pettingzoo.simple_crypto": "benchmarl.conf.environment.pettingzoo.PettingZooTask.SIMPLE_CRYPTO",
+    "pettingzoo.simple_push": "benchmarl.conf.environment.pettingzoo.PettingZooTask.SIMPLE_PUSH",
+    "pettingzoo.simple_reference": "benchmarl.conf.environment.pettingzoo.PettingZooTask.SIMPLE_REFERENCE",
+    "pettingzoo.simple_speaker_listener": "benchmarl.conf.environment.pettingzoo.PettingZooTask.SIMPLE_SPEAKER_LISTENER",
+    "pettingzoo.simple_spread": "benchmarl.conf.environment.pettingzoo.PettingZooTask.SIMPLE_SPREAD",
+    "pettingzoo.simple_tag": "benchmarl.conf.environment.pettingzoo.PettingZooTask.SIMPLE_TAG",
+    "pettingzoo.simple_world_comm": "benchmarl.conf.environment.pettingzoo.PettingZooTask.SIMPLE_WORLD_COMM",
+    "smacv2.protoss_5_vs_5": "benchmarl.conf.environment.smacv2.Smacv2Task.PROTOSS_5_VS_5",
+    "smacv2.protoss_10_vs_10": "benchmarl.conf.environment.smacv2.Smacv2Task.PROTOSS_10_VS_10",
+    "smacv2.protoss_10_vs_11": "benchmarl.conf.environment.smacv2.Smacv2Task.PROTOSS_10_VS_11",
+    "smacv2.protoss_20_vs_20": "benchmarl.conf.environment.smacv2.Smacv2Task.PROTOSS_20_VS_20",
+    "smacv2.protoss_20_vs_23": "benchmarl.conf.environment.smacv2.Smacv2Task.PROTOSS_20_VS_23",
+    "smacv2.terran_5_vs_5": "benchmarl.conf.environment.smacv2.Smacv2Task.TERRAN_5_VS_5",
+    "smacv2.terran_10_vs_10": "benchmarl.conf.environment.smacv2.Smacv2Task.TERRAN_10_VS_10",
+    "smacv2.terran_10_vs_11": "benchmarl.conf.environment.smacv2.Smacv2Task.TERRAN_10_VS_11",
+    "smacv2.terran_20_vs_20": "benchmarl.conf.environment.smacv2.Smacv2Task.TERRAN_20_VS_20",
+    "smacv2.terran_20_vs_23": "benchmarl.conf.environment.smacv2.Smacv2Task.TERRAN_20_VS_23",
+    "smacv2.zerg_5_vs_5": "benchmarl.conf.environment.smacv2.Smacv2Task.ZERG_5_VS_5",
+    "smacv2.zerg_10_vs_10": "benchmarl.conf.environment.smacv2.Smacv2Task.ZERG_10_VS_10",
+    "smacv2.zerg_10_vs_11": "benchmarl.conf.environment.smacv2.Smacv2Task.ZERG_10_VS_11",
+    "smacv2.zerg_20_vs_20": "benchmarl.conf.environment.smacv2.Smacv2Task.ZERG_20_VS_20",
+    "smacv2.zerg_20_vs_23": "benchmarl.conf.environment.smacv2.Smacv2Task.ZERG_20_VS_23",
+    "vmas.balance": "benchmarl.conf.environment.vmas.VmasTask.BALANCE",
+    "vmas.sampling": "benchmarl.conf.environment.vmas.VmasTask.SAMPLING",
+    "vmas.navigation": "benchmarl.conf.environment.vmas.VmasTask.NAVIGATION",
+    "vmas.transport": "benchmarl.conf.environment.vmas.VmasTask.TRANSPORT",
+    "vmas.reverse_transport": "benchmarl.conf.environment.vmas.VmasTask.REVERSE_TRANSPORT",
+    "vmas.wheel": "benchmarl.conf.environment.vmas.VmasTask.WHEEL",
+    "vmas.dispersion": "benchmarl.conf.environment.vmas.VmasTask.DISPERSION",
+    "vmas.dropout": "benchmarl.conf.environment.vmas.VmasTask.DROPOUT",
+    "vmas.give_way": "benchmarl.conf.environment.vmas.VmasTask.GIVE_WAY",
+    "vmas.wind_flocking": "benchmarl.conf.environment.vmas.VmasTask.WIND_FLOCKING",
+    "vmas.simple_adversary": "benchmarl.conf.environment.vmas.VmasTask.SIMPLE_ADVERSARY",
+    "vmas.simple_crypto": "benchmarl.conf.environment.vmas.VmasTask.SIMPLE_CRYPTO",
+    "vmas.simple_push": "benchmarl.conf.environment.vmas.VmasTask.SIMPLE_PUSH",
+    "vmas.simple_reference": "benchmarl.conf.environment.vmas.VmasTask.SIMPLE_REFERENCE",
+    "vmas.simple_speaker_listener": "benchmarl.conf.environment.vmas.VmasTask.SIMPLE_SPEAKER_LISTENER",
+    "vmas.simple_spread": "benchmarl.conf.environment.vmas.VmasTask.SIMPLE_SPREAD",
+    "vmas.simple_tag": "benchmarl.conf.environment.vmas.VmasTask.SIMPLE_TAG",
+    "vmas.simple_world_comm": "benchmarl.conf.environment.vmas.VmasTask.SIMPLE_WORLD_COMM",
+}
+
+# Maps task keys to the import path of their TaskConfig dataclass
+TASK_CONFIGS = {
+    "pettingzoo.multiwalker": "benchmarl.conf.environment.pettingzoo.multiwalker.TaskConfig",
+    "pettingzoo.waterworld": "benchmarl.conf.environment.pettingzoo.waterworld.TaskConfig",
+    "pettingzoo.simple_adversary": "benchmarl.conf.environment.pettingzoo.simple_adversary.TaskConfig",
+    "pettingzoo.simple_crypto": "benchmarl.conf.environment.pettingzoo.simple_crypto.TaskConfig",
+    "pettingzoo.simple_push": "benchmarl.conf.environment.pettingzoo.simple_push.TaskConfig",
+    "pettingzoo.simple_reference": "benchmarl.conf.environment.pettingzoo.simple_reference.TaskConfig",
+    "pettingzoo.simple_speaker_listener": "benchmarl.conf.environment.pettingzoo.simple_speaker_listener.TaskConfig",
+    "pettingzoo.simple_spread": "benchmarl.conf.environment.pettingzoo.simple_spread.TaskConfig",
+    "pettingzoo.simple_tag": "benchmarl.conf.environment.pettingzoo.simple_tag.TaskConfig",
+    "pettingzoo.simple_world_comm": "benchmarl.conf.environment.pettingzoo.simple_world_comm.TaskConfig",
+    "vmas.balance": "benchmarl.conf.environment.vmas.balance.TaskConfig",
+    "vmas.sampling": "benchmarl.conf.environment.vmas.sampling.TaskConfig",
+    "vmas.navigation": "benchmarl.conf.environment.vmas.navigation.TaskConfig",
+    "vmas.transport": "benchmarl.conf.environment.vmas.transport.TaskConfig",
+    "vmas.reverse_transport": "benchmarl.conf.environment.vmas.reverse_transport.TaskConfig",
+    "vmas.wheel": "benchmarl.conf.environment.vmas.wheel.TaskConfig",
+    "vmas.dispersion": "benchmarl.conf.environment.vmas.dispersion.TaskConfig",
+    "vmas.dropout": "benchmarl.conf.environment.vmas.dropout.TaskConfig",
+    "vmas.give_way": "benchmarl.conf.environment.vmas.give_way.TaskConfig",
+    "vmas.wind_flocking": "benchmarl.conf.environment.vmas.wind_flocking.TaskConfig",
+    "vmas.simple_adversary": "benchmarl.conf.environment.vmas.simple_adversary.TaskConfig",
+    "vmas.simple_crypto": "benchmarl.conf.environment.vmas.simple_crypto.TaskConfig",
+    "vmas.simple_push": "benchmarl.conf.environment.vmas.simple_push.TaskConfig",
+    "vmas.simple_reference": "benchmarl.conf.environment.vmas.simple_reference.TaskConfig",
+    "vmas.simple_speaker_listener": "benchmarl.conf.environment.vmas.simple_speaker_listener.TaskConfig",
+    "vmas.simple_spread": "benchmarl.conf.environment.vmas.simple_spread.TaskConfig",
+    "vmas.simple_tag": "benchmarl.conf.environment.vmas.simple_tag.TaskConfig",
+    "vmas.simple_world_comm": "benchmarl.conf.environment.vmas.simple_world_comm.TaskConfig",
+}
@@ -11,7 +11,6 @@ from benchmarl.lib.utils import DEVICE_TYPING
 
 from torchrl.data import CompositeSpec
 from torchrl.envs import EnvBase
-from torchrl.envs.libs.vmas import VmasEnv
 
 
 class VmasTask(Task):
@@ -43,6 +42,8 @@ class VmasTask(Task):
         seed: Optional[int],
         device: DEVICE_TYPING,
     ) -> Callable[[], EnvBase]:
+        from torchrl.envs.libs.vmas import VmasEnv
+
         return lambda: VmasEnv(
             scenario=self.name.lower(),
             num_envs=num_envs,
@@ -83,6 +83,48 @@ class ExperimentConfig:
     off_policy_memory_size: int = 1_000_000
     # Number of random action frames to prefill the replay buffer with
     off_policy_init_random_frames: int = 0
+    # Whether to sample the replay buffer of off-policy algorithms proportionally to the priority (td error) of frames
+    off_policy_use_prioritized_replay_buffer: bool = False
+    # How much prioritization is used in the prioritized replay buffer (0 corresponds to uniform sampling).
+    # The losses are not corrected with importance sampling weights, so prioritized replay biases the updates
+    # toward frames with high priority
+    off_policy_prb_alpha: float = 0.6
+    # How observations are stored in the replay buffer of off-policy algorithms: null (as they are), float16, bfloat16
+    # or uint8 (affine quantization within the bounds of the observation spec, which have to be finite).
+    # When any replay buffer compression is used, float64 entries are also stored as float32
+    off_policy_replay_buffer_observation_codec: Optional[str] = None
+    # Whether to bit-pack boolean entries (e.g., done, terminated and action masks) in the replay buffer of off-policy algorithms
+    off_policy_replay_buffer_pack_bools: bool = False
+    # Whether to store each observation once in the replay buffer of off-policy algorithms, instead of also storing it
+    # as the next observation of the previous frame. Next observations are read back from the following frame when sampling,
+    # only those that differ from it (e.g., at the end of episodes) are stored separately
+    off_policy_replay_buffer_dedup_next_observation: bool = False
+    # Whether the replay buffers of the groups of off-policy algorithms share the storage of global entries
+    # (e.g., the state and the global reward and done), so that they are stored once instead of once per group
+    off_policy_replay_buffer_share_global_entries: bool = False
+    # Whether the replay buffers of off-policy algorithms store only the entries read by the losses
+    # (e.g., dropping the policy outputs collected with the actions). The entries are declared by each algorithm
+    # and checked when the experiment is set up, the bytes saved per frame are logged
+    off_policy_replay_buffer_loss_keys_only: bool = False
+    # Number of minibatches gathered from the replay buffer of off-policy algorithms on a background thread
+    # while training on the current one. With the prioritized replay buffer, minibatches are sampled with the priorities
+    # of this many steps before. Set it to 0 to sample each minibatch when it is used
+    off_policy_n_prefetched_minibatches: int = 0
+    # Number of minibatches sampled at once from the replay buffer of off-policy algorithms, in one contiguous block
+    # that is sliced at each optimizer step. With the prioritized replay buffer, the minibatches of a block are sampled with
+    # the priorities of the first step. It cannot be used with off_policy_n_prefetched_minibatches.
+    # Set it to 0 to sample each minibatch when it is used
+    off_policy_n_bulk_sampled_minibatches: int = 0
+    # If set, the replay buffers of off-policy algorithms keep only this number of most recent frames in memory (hot tier),
+    # all frames are kept in memory-mapped files on disk (cold tier). It requires off_policy_n_prefetched_minibatches,
+    # so that frames are read from disk on a background thread, and it cannot be used with replay buffer codecs,
+    # deduplication of next observations or shared global entries
+    off_policy_replay_buffer_hot_size: Optional[int] = None
+    # Fraction of the minibatches sampled from the hot tier (when off_policy_replay_buffer_hot_size is set
+    # and the prioritized replay buffer is not used), the rest is sampled uniformly from all frames
+    off_policy_replay_buffer_hot_sampling_fraction: float = 0.5
+    # Absolute path to the folder of the cold tier of replay buffers. If null, a temporary folder is used
+    off_policy_replay_buffer_scratch_dir: Optional[str] = None
 
     evaluation: bool = True
     # Whether to render the evaluation (if rendering is available)
@@ -93,12 +135,19 @@ class ExperimentConfig:
     evaluation_episodes: int = 10
     # If True, when stochastic policies are evaluated, their mode is taken, otherwise, if False, they are sampled
     evaluation_deterministic_actions: bool = True
+    # If False, the evaluation environment is closed after each evaluation and created again for the next one.
+    # This saves memory between evaluations, at the cost of creating the environment at every evaluation
+    keep_evaluation_env: bool = True
 
     # List of loggers to use, options are: wandb, csv, tensorboard, mflow
     loggers: List[str] = list_field(["csv"])
     # Create a json folder as part of the output in the format of marl-eval
     create_json: bool = True
 
+    # Absolute path to a folder where the specs of tasks are cached, so that experiments on an already cached task
+    # do not have to create an environment to set up. If null, specs are not cached.
+    spec_cache_folder: Optional[str] = None
+
     # Absolute path to the folder where the experiment will log.
     # If null, this will default to the hydra output dir (if using hydra) or to the current folder when the script is run (if not).
     save_folder: Optional[str] = None
@@ -107,6 +156,8 @@ class ExperimentConfig:
     # Interval for experiment saving in terms of collected frames (this should be a multiple of on/off_policy_collected_frames_per_batch).
     # Set it to 0 to disable checkpointing
     checkpoint_interval: float = 300_000
+    # Whether to checkpoint when the experiment is done
+    checkpoint_at_end: bool = False
 
     def train_batch_size(self, on_policy: bool) -> int:
         """
@@ -266,5 +317,30 @@ class ExperimentConfig:
                 f"checkpoint_interval ({self.checkpoint_interval}) "
                 f"is not a multiple of the collected_frames_per_batch ({self.collected_frames_per_batch(on_policy)})"
             )
+        if (
+            self.off_policy_n_prefetched_minibatches
+            and self.off_policy_n_bulk_sampled_minibatches
+        ):
+            raise ValueError(
+                "off_policy_n_prefetched_minibatches and off_policy_n_bulk_sampled_minibatches cannot be both set"
+            )
+        if self.off_policy_replay_buffer_hot_size is not None and (
+            self.off_policy_replay_buffer_observation_codec is not None
+            or self.off_policy_replay_buffer_pack_bools
+            or self.off_policy_replay_buffer_dedup_next_observation
+            or self.off_policy_replay_buffer_share_global_entries
+        ):
+            raise ValueError(
+                "off_policy_replay_buffer_hot_size cannot be used with replay buffer codecs, "
+                "deduplication of next observations or shared global entries"
+            )
+        if (
+            self.off_policy_replay_buffer_hot_size is not None
+            and not self.off_policy_n_prefetched_minibatches
+        ):
+            raise ValueError(
+                "off_policy_replay_buffer_hot_size requires off_policy_n_prefetched_minibatches to be set, "
+                "so that the frames of the cold tier are read on a background thread"
+            )
         if self.max_n_frames is None and self.max_n_iters is None:
             raise ValueError("n_iters and total_frames are both not set")
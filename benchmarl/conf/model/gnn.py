@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional, Type
+from typing import List, Optional, Type
 
 import torch_geometric
 
@@ -21,6 +21,13 @@ class GnnConfig(ModelConfig):
         torch_geometric.nn.MessagePassing
     ] = torch_geometric.nn.conv.GraphConv
     gnn_kwargs: Optional[dict] = df(lambda: {"aggr": "add"})
+    position_indices: Optional[List[int]] = None
+    edge_radius: Optional[float] = None
+    n_neighbours: Optional[int] = None
+    distance_edge_features: bool = False
+    dense_max_agents: int = 32
+    agent_chunk_size: Optional[int] = None
+    checkpoint_agent_chunks: bool = False
 
     @staticmethod
     def associated_class():
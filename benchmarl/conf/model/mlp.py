@@ -24,6 +24,13 @@ class MlpConfig(ModelConfig):
     norm_class: Type[nn.Module] = None
     norm_kwargs: Optional[dict] = None
 
+    shared_trunk: bool = False
+
+    agent_chunk_size: Optional[int] = None
+    checkpoint_agent_chunks: bool = False
+
+    agent_embedding_dim: Optional[int] = None
+
     @staticmethod
     def associated_class():
         return Mlp
@@ -4,6 +4,8 @@
 #  LICENSE file in the root directory of this source tree.
 #
 
+from benchmarl.lib.utils import _LazyRegistry
+
 from .common import Algorithm
 from .iddpg import Iddpg
 from .ippo import Ippo
@@ -27,6 +29,14 @@ classes = [
     "Vdn",
 ]
 
+# Maps algorithm names to their configs, which are imported when first used
+algorithm_config_registry = _LazyRegistry(
+    {
+        name.lower(): f"benchmarl.conf.algorithm.cfg_{name.lower()}.{name}Config"
+        for name in classes
+    }
+)
+
 __all__ = [
     Algorithm,
     Iddpg,
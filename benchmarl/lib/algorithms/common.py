@@ -5,22 +5,39 @@
 #
 
 from abc import ABC, abstractmethod
-from typing import Dict, Iterable, Tuple
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import torch
 
 from benchmarl.lib.models.common import ModelConfig
+from benchmarl.lib.replay_buffers import (
+    AffineUInt8Codec,
+    CastCodec,
+    Codec,
+    CodecStorage,
+    NextDedupStorage,
+    OnPolicyMinibatchIterator,
+    PrioritizedReplayBuffer,
+    SumTreeSampler,
+    TieredSampler,
+    TieredStorage,
+)
 
 from benchmarl.lib.utils import DEVICE_TYPING
 
 from tensordict import TensorDictBase
 from tensordict.nn import TensorDictModule, TensorDictSequential
+from tensordict.utils import NestedKey
 from torchrl.data import (
     DiscreteTensorSpec,
     LazyTensorStorage,
     OneHotDiscreteTensorSpec,
     ReplayBuffer,
     TensorDictReplayBuffer,
+    TensorSpec,
 )
-from torchrl.data.replay_buffers import RandomSampler, SamplerWithoutReplacement
+from torchrl.data.replay_buffers import RandomSampler
 from torchrl.objectives import LossModule
 from torchrl.objectives.utils import HardUpdate, SoftUpdate, TargetNetUpdater
 
@@ -53,6 +70,8 @@ class Algorithm(ABC):
         self._losses_and_updaters = {}
         self._policies_for_loss = {}
         self._policies_for_collection = {}
+        self._shared_storage = None
+        self._broadcast_keys = {}
 
         self._check_specs()
 
@@ -139,28 +158,184 @@ class Algorithm(ABC):
     def get_replay_buffer(
         self,
         group: str,
-    ) -> ReplayBuffer:
+        codecs: Optional[Dict[NestedKey, Codec]] = None,
+    ) -> Union[ReplayBuffer, OnPolicyMinibatchIterator]:
         """
         Get the ReplayBuffer for a specific group.
-        This function will check ``self.on_policy`` and create the buffer accordingly
+        This function will check ``self.on_policy`` and create the buffer accordingly.
+        On-policy algorithms get an :class:`~benchmarl.lib.replay_buffers.OnPolicyMinibatchIterator`,
+        which iterates over the collected batch without copying it into a storage.
 
         Args:
             group (str): agent group of the loss and updater
+            codecs (dict, optional): a mapping from entry keys to the codecs used to store them in off-policy buffers.
+                If None, codecs are chosen according to the experiment config
 
         Returns: ReplayBuffer the group
         """
         memory_size = self.experiment_config.replay_buffer_memory_size(self.on_policy)
         sampling_size = self.experiment_config.train_minibatch_size(self.on_policy)
         storing_device = self.device
-        sampler = SamplerWithoutReplacement() if self.on_policy else RandomSampler()
+
+        if self.on_policy:
+            return OnPolicyMinibatchIterator(sampling_size, device=storing_device)
+
+        if self.experiment_config.off_policy_use_prioritized_replay_buffer:
+            loss, _ = self.get_loss_and_updater(group)
+            return PrioritizedReplayBuffer(
+                storage=self._get_storage(group, memory_size, codecs),
+                sampler=SumTreeSampler(
+                    memory_size,
+                    alpha=self.experiment_config.off_policy_prb_alpha,
+                    device=storing_device,
+                ),
+                batch_size=sampling_size,
+                priority_key=loss.tensor_keys.priority,
+            )
 
         return TensorDictReplayBuffer(
-            storage=LazyTensorStorage(memory_size, device=storing_device),
-            sampler=sampler,
+            storage=self._get_storage(group, memory_size, codecs),
+            sampler=(
+                TieredSampler(
+                    self.experiment_config.off_policy_replay_buffer_hot_sampling_fraction
+                )
+                if self.experiment_config.off_policy_replay_buffer_hot_size is not None
+                else RandomSampler()
+            ),
             batch_size=sampling_size,
             priority_key=(group, "td_error"),
         )
 
+    def _get_storage(
+        self,
+        group: str,
+        memory_size: int,
+        codecs: Optional[Dict[NestedKey, Codec]],
+    ) -> LazyTensorStorage:
+        if self.experiment_config.off_policy_replay_buffer_hot_size is not None:
+            scratch_dir = self.experiment_config.off_policy_replay_buffer_scratch_dir
+            return TieredStorage(
+                memory_size,
+                hot_size=self.experiment_config.off_policy_replay_buffer_hot_size,
+                scratch_dir=(
+                    str(Path(scratch_dir) / group) if scratch_dir is not None else None
+                ),
+                device=self.device,
+            )
+        if codecs is None:
+            codecs = self._get_codecs(group)
+        dedup_keys = list(self._get_observation_specs(group).keys())
+        if self._share_global_entries():
+            if self._shared_storage is None:
+                self._shared_storage = self._make_storage(
+                    memory_size,
+                    codecs,
+                    dedup_keys=[key for key in dedup_keys if key[0] != group],
+                )
+            return self._make_storage(
+                memory_size,
+                codecs,
+                dedup_keys=[key for key in dedup_keys if key[0] == group],
+                shared_storage=self._shared_storage,
+                group=group,
+            )
+        return self._make_storage(memory_size, codecs, dedup_keys=dedup_keys)
+
+    def _make_storage(
+        self,
+        memory_size: int,
+        codecs: Dict[NestedKey, Codec],
+        dedup_keys: List[NestedKey],
+        **kwargs,
+    ) -> LazyTensorStorage:
+        pack_bools = self.experiment_config.off_policy_replay_buffer_pack_bools
+        if self.experiment_config.off_policy_replay_buffer_dedup_next_observation:
+            return NextDedupStorage(
+                memory_size,
+                dedup_keys=dedup_keys,
+                codecs=codecs,
+                pack_bools=pack_bools,
+                device=self.device,
+                **kwargs,
+            )
+        if not len(codecs) and not pack_bools and not self._share_global_entries():
+            # The shared storage and the group storages reading from it must be codec storages
+            return LazyTensorStorage(memory_size, device=self.device)
+        return CodecStorage(
+            memory_size,
+            codecs=codecs,
+            pack_bools=pack_bools,
+            device=self.device,
+            **kwargs,
+        )
+
+    def _share_global_entries(self) -> bool:
+        return (
+            self.experiment_config.off_policy_replay_buffer_share_global_entries
+            and len(self.group_map) > 1
+        )
+
+    def _get_codecs(self, group: str) -> Dict[NestedKey, Codec]:
+        observation_codec = (
+            self.experiment_config.off_policy_replay_buffer_observation_codec
+        )
+        if observation_codec is None:
+            return {}
+
+        codecs = {}
+        for key, spec in self._get_observation_specs(group).items():
+            for stored_key in (key, ("next", *key)):
+                if observation_codec in ("float16", "bfloat16"):
+                    codecs[stored_key] = CastCodec(getattr(torch, observation_codec))
+                elif observation_codec == "uint8":
+                    codecs[stored_key] = AffineUInt8Codec.from_spec(spec)
+                else:
+                    raise ValueError(
+                        f"Unknown replay buffer observation codec {observation_codec}, "
+                        "choose one of float16, bfloat16, uint8"
+                    )
+        return codecs
+
+    def _get_observation_specs(self, group: str) -> Dict[NestedKey, TensorSpec]:
+        observation_specs = {
+            (group, "observation"): self.observation_spec[group, "observation"]
+        }
+        if self.state_spec is not None:
+            observation_specs.update({("state",): self.state_spec["state"]})
+        return observation_specs
+
+    def _get_broadcast_keys(
+        self, group: str, batch: TensorDictBase
+    ) -> Dict[NestedKey, NestedKey]:
+        """
+        The per-agent done, terminated and reward keys of a group that are missing from the collected data,
+        mapped to the global keys they can be broadcast from.
+        The mapping is computed on the first batch of the group and then reused.
+        """
+        if group not in self._broadcast_keys:
+            keys = batch.keys(True, True)
+            self._broadcast_keys[group] = {
+                ("next", group, name): ("next", name)
+                for name in ("done", "terminated", "reward")
+                if ("next", group, name) not in keys
+            }
+        return self._broadcast_keys[group]
+
+    def _broadcast_global_keys(
+        self, group: str, batch: TensorDictBase
+    ) -> TensorDictBase:
+        """
+        Sets the per-agent done, terminated and reward keys of a group missing from the collected data
+        as expanded views of the global ones, without copying them.
+        """
+        group_shape = batch.get(group).shape
+        for group_key, global_key in self._get_broadcast_keys(group, batch).items():
+            batch.set(
+                group_key,
+                batch.get(global_key).unsqueeze(-1).expand((*group_shape, 1)),
+            )
+        return batch
+
     def get_policy_for_loss(self, group: str) -> TensorDictModule:
         """
         Get the non-explorative policy for a specific group loss.
@@ -314,3 +489,51 @@ class Algorithm(ABC):
         Returns: the processed loss_vals
         """
         return loss_vals
+
+    def process_sampled_batch(
+        self, group: str, batch: TensorDictBase
+    ) -> TensorDictBase:
+        """
+        This function can be used to process a batch sampled from the replay buffer before it is passed to the loss.
+        For example, entries that are not stored per agent can be broadcast to the agents here.
+
+        Args:
+            group (str): agent group
+            batch (TensorDictBase): the batch sampled from the replay buffer
+
+        Returns: the processed batch
+        """
+        return batch
+
+    def get_loss_in_keys(self, group: str) -> Optional[List[NestedKey]]:
+        """
+        The keys of the processed batch that the loss of a group reads.
+        When ``off_policy_replay_buffer_loss_keys_only`` is set, off-policy replay buffers store only these keys.
+        Keys written by the loss during its forward pass (e.g., action values) or by
+        :meth:`process_sampled_batch` should not be included.
+
+        Args:
+            group (str): agent group
+
+        Returns: the list of keys, or None to store the whole batch
+        """
+        return None
+
+    def _get_transition_keys(
+        self, group: str, reward_keys: List[NestedKey]
+    ) -> List[NestedKey]:
+        """
+        The keys of a transition of a group: its inputs (observation, state and action mask) and action,
+        the inputs at the next step, and the ``reward_keys`` (e.g., reward, done and terminated) at the next step.
+        Next step keys that are broadcast from global keys when sampled are replaced by the global keys.
+        """
+        input_keys = list(self._get_observation_specs(group).keys())
+        if self.action_mask_spec is not None and group in self.action_mask_spec.keys():
+            input_keys.append((group, "action_mask"))
+        next_keys = [("next", *key) for key in [*input_keys, *reward_keys]]
+        broadcast_keys = self._broadcast_keys.get(group, {})
+        return [
+            *input_keys,
+            (group, "action"),
+            *[broadcast_keys.get(key, key) for key in next_keys],
+        ]
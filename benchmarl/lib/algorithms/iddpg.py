@@ -4,7 +4,7 @@
 #  LICENSE file in the root directory of this source tree.
 #
 
-from typing import Dict, Iterable, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 import torch
 
@@ -12,6 +12,7 @@ from benchmarl.lib.algorithms.common import Algorithm
 from benchmarl.lib.models.common import ModelConfig
 from tensordict import TensorDictBase
 from tensordict.nn import TensorDictModule, TensorDictSequential
+from tensordict.utils import NestedKey
 from torchrl.data import CompositeSpec, UnboundedContinuousTensorSpec
 from torchrl.modules import (
     AdditiveGaussianWrapper,
@@ -163,33 +164,21 @@ class Iddpg(Algorithm):
         )
 
     def process_batch(self, group: str, batch: TensorDictBase) -> TensorDictBase:
-        keys = list(batch.keys(True, True))
-        group_shape = batch.get(group).shape
-
-        nested_done_key = ("next", group, "done")
-        nested_terminated_key = ("next", group, "terminated")
-        nested_reward_key = ("next", group, "reward")
-
-        if nested_done_key not in keys:
-            batch.set(
-                nested_done_key,
-                batch.get(("next", "done")).unsqueeze(-1).expand((*group_shape, 1)),
-            )
-        if nested_terminated_key not in keys:
-            batch.set(
-                nested_terminated_key,
-                batch.get(("next", "terminated"))
-                .unsqueeze(-1)
-                .expand((*group_shape, 1)),
-            )
+        # The per-agent done, terminated and reward missing from the batch are broadcast from the global ones
+        # only when sampled, so that the replay buffer stores them once per frame instead of once per agent
+        self._get_broadcast_keys(group, batch)
+        return batch
 
-        if nested_reward_key not in keys:
-            batch.set(
-                nested_reward_key,
-                batch.get(("next", "reward")).unsqueeze(-1).expand((*group_shape, 1)),
-            )
+    def process_sampled_batch(
+        self, group: str, batch: TensorDictBase
+    ) -> TensorDictBase:
+        return self._broadcast_global_keys(group, batch)
 
-        return batch
+    def get_loss_in_keys(self, group: str) -> List[NestedKey]:
+        return self._get_transition_keys(
+            group,
+            reward_keys=[(group, "reward"), (group, "done"), (group, "terminated")],
+        )
 
     #####################
     # Custom new methods
@@ -209,31 +209,7 @@ class Mappo(Algorithm):
         return policy_for_loss
 
     def process_batch(self, group: str, batch: TensorDictBase) -> TensorDictBase:
-        keys = list(batch.keys(True, True))
-        group_shape = batch.get(group).shape
-
-        nested_done_key = ("next", group, "done")
-        nested_terminated_key = ("next", group, "terminated")
-        nested_reward_key = ("next", group, "reward")
-
-        if nested_done_key not in keys:
-            batch.set(
-                nested_done_key,
-                batch.get(("next", "done")).unsqueeze(-1).expand((*group_shape, 1)),
-            )
-        if nested_terminated_key not in keys:
-            batch.set(
-                nested_terminated_key,
-                batch.get(("next", "terminated"))
-                .unsqueeze(-1)
-                .expand((*group_shape, 1)),
-            )
-
-        if nested_reward_key not in keys:
-            batch.set(
-                nested_reward_key,
-                batch.get(("next", "reward")).unsqueeze(-1).expand((*group_shape, 1)),
-            )
+        batch = self._broadcast_global_keys(group, batch)
 
         with torch.no_grad():
             loss = self.get_loss_and_updater(group)[0]
@@ -243,7 +219,14 @@ class Mappo(Algorithm):
                 target_params=loss.target_critic_network_params,
             )
 
-        return batch
+        # The broadcast entries are only needed by the value estimator,
+        # they are broadcast again when sampled instead of being gathered with the minibatches
+        return batch.exclude(*self._get_broadcast_keys(group, batch).keys())
+
+    def process_sampled_batch(
+        self, group: str, batch: TensorDictBase
+    ) -> TensorDictBase:
+        return self._broadcast_global_keys(group, batch)
 
     def process_loss_vals(
         self, group: str, loss_vals: TensorDictBase
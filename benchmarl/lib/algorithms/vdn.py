@@ -4,13 +4,14 @@
 #  LICENSE file in the root directory of this source tree.
 #
 
-from typing import Dict, Iterable, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 from benchmarl.lib.algorithms.common import Algorithm
 from benchmarl.lib.models.common import ModelConfig
 
 from tensordict import TensorDictBase
 from tensordict.nn import TensorDictModule, TensorDictSequential
+from tensordict.utils import NestedKey
 from torchrl.data import CompositeSpec, UnboundedContinuousTensorSpec
 from torchrl.modules import EGreedyModule, QValueModule, VDNMixer
 from torchrl.objectives import LossModule, QMixerLoss, ValueEstimators
@@ -177,6 +178,11 @@ class Vdn(Algorithm):
 
         return batch
 
+    def get_loss_in_keys(self, group: str) -> List[NestedKey]:
+        return self._get_transition_keys(
+            group, reward_keys=[("reward",), ("done",), ("terminated",)]
+        )
+
     #####################
     # Custom new methods
     #####################
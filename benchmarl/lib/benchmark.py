@@ -4,12 +4,14 @@
 #  LICENSE file in the root directory of this source tree.
 #
 
+import copy
 from typing import Iterator, Optional, Sequence, Set
 
 from benchmarl.conf.algorithm.cfg_common import AlgorithmConfig
 from benchmarl.conf.environment import Task
 from benchmarl.lib.experiment import Experiment, ExperimentConfig
 from benchmarl.lib.models.common import ModelConfig
+from benchmarl.lib.run_registry import RunRegistry
 
 
 class Benchmark:
@@ -24,6 +26,9 @@ class Benchmark:
         seeds (set of int): the seeds for the benchmark
         experiment_config (ExperimentConfig): the experiment config
         critic_model_config (ModelConfig, optional): the config of the critic model. Defaults to model_config
+        run_registry (RunRegistry, optional): if provided, experiments are stored in the registry.
+            Experiments already completed in the registry are skipped and
+            interrupted ones are resumed from their latest checkpoint.
 
     """
 
@@ -35,6 +40,7 @@ class Benchmark:
         seeds: Set[int],
         experiment_config: ExperimentConfig,
         critic_model_config: Optional[ModelConfig] = None,
+        run_registry: Optional[RunRegistry] = None,
     ):
         self.algorithm_configs = algorithm_configs
         self.tasks = tasks
@@ -45,6 +51,7 @@ class Benchmark:
             critic_model_config if critic_model_config is not None else model_config
         )
         self.experiment_config = experiment_config
+        self.run_registry = run_registry
 
         print(f"Created benchmark with {self.n_experiments} experiments.")
 
@@ -58,13 +65,43 @@ class Benchmark:
         for algorithm_config in self.algorithm_configs:
             for task in self.tasks:
                 for seed in self.seeds:
+                    experiment_config = self.experiment_config
+                    callbacks = []
+                    if self.run_registry is not None:
+                        run_hash = self.run_registry.run_hash(
+                            task=task,
+                            algorithm_config=algorithm_config,
+                            model_config=self.model_config,
+                            critic_model_config=self.critic_model_config,
+                            seed=seed,
+                            experiment_config=self.experiment_config,
+                        )
+                        if self.run_registry.is_completed(run_hash):
+                            print(f"Skipping completed run {run_hash}.")
+                            continue
+                        experiment_config = copy.deepcopy(self.experiment_config)
+                        checkpoint = self.run_registry.latest_checkpoint(run_hash)
+                        if checkpoint is not None:
+                            print(f"Resuming run {run_hash} from {checkpoint}.")
+                            experiment_config.save_folder = None
+                            experiment_config.restore_file = str(checkpoint)
+                        else:
+                            run_folder = self.run_registry.run_folder(run_hash)
+                            run_folder.mkdir(parents=False, exist_ok=True)
+                            experiment_config.save_folder = str(run_folder)
+                            experiment_config.restore_file = None
+                        callbacks.append(
+                            self.run_registry.completion_callback(run_hash)
+                        )
+
                     yield Experiment(
                         task=task,
                         algorithm_config=algorithm_config,
                         seed=seed,
                         model_config=self.model_config,
                         critic_model_config=self.critic_model_config,
-                        config=self.experiment_config,
+                        config=experiment_config,
+                        callbacks=callbacks,
                     )
 
     def run_sequential(self):
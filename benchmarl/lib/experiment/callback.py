@@ -73,6 +73,10 @@ class Callback:
         """
         pass
 
+    def on_experiment_end(self):
+        """A callback called when the experiment has collected all its frames."""
+        pass
+
 
 class CallbackNotifier:
     def __init__(self, experiment, callbacks: List[Callback]):
@@ -106,3 +110,7 @@ class CallbackNotifier:
     def _on_evaluation_end(self, rollouts: List[TensorDictBase]):
         for callback in self.callbacks:
             callback.on_evaluation_end(rollouts)
+
+    def _on_experiment_end(self):
+        for callback in self.callbacks:
+            callback.on_experiment_end()
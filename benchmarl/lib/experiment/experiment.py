@@ -20,18 +20,30 @@ from benchmarl.conf.environment import Task
 from benchmarl.conf.experiment.common import ExperimentConfig
 from benchmarl.lib.experiment.callback import Callback, CallbackNotifier
 from benchmarl.lib.experiment.logger import Logger
+from benchmarl.lib.experiment.spec_cache import SpecCache, TaskSpecs
 from benchmarl.lib.models.common import ModelConfig
+from benchmarl.lib.replay_buffers import (
+    BulkMinibatchSampler,
+    CodecStorage,
+    MinibatchPrefetcher,
+)
 from eztils.torch import seed_everything
 from tensordict import TensorDictBase
 from tensordict.nn import TensorDictSequential
 from torchrl.collectors import SyncDataCollector
-from torchrl.envs import SerialEnv, TransformedEnv
+from torchrl.envs import EnvBase, SerialEnv, TransformedEnv
 from torchrl.envs.transforms import Compose
 from torchrl.envs.utils import ExplorationType, set_exploration_type
 from torchrl.record.loggers import generate_exp_name
 from tqdm import tqdm
 
 
+def _bytes_per_frame(batch: TensorDictBase) -> int:
+    return sum(
+        tensor[0].numel() * tensor.element_size() for tensor in batch.values(True, True)
+    )
+
+
 class Experiment(CallbackNotifier):
     """
     Main experiment class in BenchMARL.
@@ -77,6 +89,7 @@ class Experiment(CallbackNotifier):
         self.total_frames = 0
         self.n_iters_performed = 0
         self.mean_return = 0
+        self.mean_eval_return = None
 
         if self.config.restore_file is not None:
             self._load_experiment()
@@ -93,6 +106,7 @@ class Experiment(CallbackNotifier):
         self._setup_task()
         self._setup_algorithm()
         self._setup_collector()
+        self._setup_replay_buffer_keys()
         self._setup_name()
         self._setup_logger()
         self._on_setup()
@@ -121,14 +135,6 @@ class Experiment(CallbackNotifier):
             )
 
     def _setup_task(self):
-        test_env = self.model_config.process_env_fun(
-            self.task.get_env_fun(
-                num_envs=self.config.evaluation_episodes,
-                continuous_actions=self.continuous_actions,
-                seed=self.seed,
-                device=self.config.sampling_device,
-            )
-        )()
         env_func = self.model_config.process_env_fun(
             self.task.get_env_fun(
                 num_envs=self.config.n_envs_per_worker(self.on_policy),
@@ -138,19 +144,49 @@ class Experiment(CallbackNotifier):
             )
         )
 
-        self.observation_spec = self.task.observation_spec(test_env)
-        self.info_spec = self.task.info_spec(test_env)
-        self.state_spec = self.task.state_spec(test_env)
-        self.action_mask_spec = self.task.action_mask_spec(test_env)
-        self.action_spec = self.task.action_spec(test_env)
-        self.group_map = self.task.group_map(test_env)
+        self._test_env = None
+        specs = None
+        spec_cache = (
+            SpecCache(self.config.spec_cache_folder)
+            if self.config.spec_cache_folder is not None
+            else None
+        )
+        if spec_cache is not None:
+            specs = spec_cache.get(
+                self.task,
+                self.continuous_actions,
+                self.model_config,
+                self.config.sampling_device,
+            )
+        if specs is None:
+            test_env = self._make_test_env()
+            specs = TaskSpecs.from_env(self.task, test_env)
+            if spec_cache is not None:
+                spec_cache.put(
+                    self.task,
+                    self.continuous_actions,
+                    self.model_config,
+                    self.config.sampling_device,
+                    specs,
+                )
+            if self.config.evaluation and self.config.keep_evaluation_env:
+                self._test_env = test_env
+            else:
+                test_env.close()
+
+        self.observation_spec = specs.observation_spec
+        self.info_spec = specs.info_spec
+        self.state_spec = specs.state_spec
+        self.action_mask_spec = specs.action_mask_spec
+        self.action_spec = specs.action_spec
+        self.group_map = specs.group_map
         self.train_group_map = copy.deepcopy(self.group_map)
-        self.max_steps = self.task.max_steps(test_env)
+        self.max_steps = specs.max_steps
 
-        transforms = [self.task.get_reward_sum_transform(test_env)]
+        transforms = [specs.reward_sum_transform]
         transform = Compose(*transforms)
 
-        if test_env.batch_size == ():
+        if not specs.batched:
             self.env_func = lambda: TransformedEnv(
                 SerialEnv(self.config.n_envs_per_worker(self.on_policy), env_func),
                 transform.clone(),
@@ -158,7 +194,22 @@ class Experiment(CallbackNotifier):
         else:
             self.env_func = lambda: TransformedEnv(env_func(), transform.clone())
 
-        self.test_env = test_env.to(self.config.sampling_device)
+    def _make_test_env(self) -> EnvBase:
+        return self.model_config.process_env_fun(
+            self.task.get_env_fun(
+                num_envs=self.config.evaluation_episodes,
+                continuous_actions=self.continuous_actions,
+                seed=self.seed,
+                device=self.config.sampling_device,
+            )
+        )().to(self.config.sampling_device)
+
+    @property
+    def test_env(self) -> EnvBase:
+        """The evaluation environment, created on first use."""
+        if self._test_env is None:
+            self._test_env = self._make_test_env()
+        return self._test_env
 
     def _setup_algorithm(self):
         self.algorithm = self.algorithm_config.get_algorithm(experiment=self)
@@ -168,6 +219,23 @@ class Experiment(CallbackNotifier):
             )
             for group in self.group_map.keys()
         }
+        self.minibatch_samplers = {}
+        if not self.on_policy and self.config.off_policy_n_prefetched_minibatches:
+            self.minibatch_samplers = {
+                group: MinibatchPrefetcher(
+                    self.replay_buffers[group],
+                    n_prefetch=self.config.off_policy_n_prefetched_minibatches,
+                )
+                for group in self.group_map.keys()
+            }
+        elif not self.on_policy and self.config.off_policy_n_bulk_sampled_minibatches:
+            self.minibatch_samplers = {
+                group: BulkMinibatchSampler(
+                    self.replay_buffers[group],
+                    block_size=self.config.off_policy_n_bulk_sampled_minibatches,
+                )
+                for group in self.group_map.keys()
+            }
         self.losses = {
             group: self.algorithm.get_loss_and_updater(group)[0]
             for group in self.group_map.keys()
@@ -207,6 +275,41 @@ class Experiment(CallbackNotifier):
             ),
         )
 
+    def _setup_replay_buffer_keys(self):
+        self.replay_buffer_keys = {group: None for group in self.group_map.keys()}
+        if self.on_policy or not self.config.off_policy_replay_buffer_loss_keys_only:
+            return
+
+        # Dry run of the losses on a batch with the structure of the collected ones,
+        # to check that the keys declared by the algorithm are all the keys the losses read
+        batch = self.collector.env.fake_tensordict()
+        for group in self.group_map.keys():
+            group_batch = batch.exclude(*self._get_excluded_keys(group)).clone()
+            group_batch = self.algorithm.process_batch(group, group_batch)
+            group_batch = group_batch.reshape(-1).to(self.config.train_device)
+            keys = self.algorithm.get_loss_in_keys(group)
+            if keys is None:
+                continue
+            missing_keys = [key for key in keys if group_batch.get(key, None) is None]
+            if len(missing_keys):
+                raise ValueError(
+                    f"The loss keys {missing_keys} declared by {type(self.algorithm).__name__} "
+                    f"for group {group} are not in the collected data"
+                )
+            try:
+                with torch.random.fork_rng(), torch.no_grad():
+                    self.losses[group](
+                        self.algorithm.process_sampled_batch(
+                            group, group_batch.select(*keys)
+                        )
+                    )
+            except KeyError as err:
+                raise ValueError(
+                    f"The loss of group {group} reads keys that are not declared by "
+                    f"{type(self.algorithm).__name__}.get_loss_in_keys: {err}"
+                ) from err
+            self.replay_buffer_keys[group] = keys
+
     def _setup_name(self):
         self.algorithm_name = self.algorithm_config.associated_class().__name__.lower()
         self.model_name = self.model_config.associated_class().__name__.lower()
@@ -231,6 +334,7 @@ class Experiment(CallbackNotifier):
             if (
                 len(self.config.loggers)
                 or self.config.checkpoint_interval > 0
+                or self.config.checkpoint_at_end
                 or self.config.create_json
             ):
                 self.folder_name.mkdir(parents=False, exist_ok=False)
@@ -303,14 +407,39 @@ class Experiment(CallbackNotifier):
                 group_batch = batch.exclude(*self._get_excluded_keys(group))
                 group_batch = self.algorithm.process_batch(group, group_batch)
                 group_batch = group_batch.reshape(-1)
+                if self.replay_buffer_keys[group] is not None:
+                    stored_batch = group_batch.select(*self.replay_buffer_keys[group])
+                    self.logger.log(
+                        {
+                            f"train/{group}/replay_buffer_bytes_saved_per_frame": _bytes_per_frame(
+                                group_batch
+                            )
+                            - _bytes_per_frame(stored_batch)
+                        },
+                        step=self.n_iters_performed,
+                    )
+                    group_batch = stored_batch
                 self.replay_buffers[group].extend(group_batch)
+                storage = getattr(self.replay_buffers[group], "_storage", None)
+                if isinstance(storage, CodecStorage):
+                    self.logger.log(
+                        {
+                            f"train/{group}/replay_buffer_compression_ratio": storage.compression_ratio
+                        },
+                        step=self.n_iters_performed,
+                    )
 
+                n_minibatch_iters = self.config.train_batch_size(
+                    self.on_policy
+                ) // self.config.train_minibatch_size(self.on_policy)
+                if group in self.minibatch_samplers:
+                    self.minibatch_samplers[group].start(
+                        self.config.n_optimizer_steps(self.on_policy)
+                        * n_minibatch_iters
+                    )
                 training_tds = []
                 for _ in range(self.config.n_optimizer_steps(self.on_policy)):
-                    for _ in range(
-                        self.config.train_batch_size(self.on_policy)
-                        // self.config.train_minibatch_size(self.on_policy)
-                    ):
+                    for _ in range(n_minibatch_iters):
                         training_tds.append(self._optimizer_loop(group))  #!! important
                 training_td = torch.stack(training_tds)
                 self.logger.log_training(
@@ -367,14 +496,24 @@ class Experiment(CallbackNotifier):
             pbar.update()
             sampling_start = time.time()
 
+        if self.config.checkpoint_at_end:
+            self._save_experiment()
+        self._on_experiment_end()
         self.close()
 
     def close(self):
         """Close the experiment."""
         self.collector.shutdown()
-        self.test_env.close()
+        for minibatch_sampler in self.minibatch_samplers.values():
+            minibatch_sampler.close()
+        self._close_test_env()
         self.logger.finish()
 
+    def _close_test_env(self):
+        if self._test_env is not None:
+            self._test_env.close()
+            self._test_env = None
+
     def _get_excluded_keys(self, group: str):
         excluded_keys = []
         for other_group in self.group_map.keys():
@@ -384,7 +523,11 @@ class Experiment(CallbackNotifier):
         return excluded_keys
 
     def _optimizer_loop(self, group: str) -> TensorDictBase:
-        subdata = self.replay_buffers[group].sample()
+        if group in self.minibatch_samplers:
+            subdata = self.minibatch_samplers[group].sample()
+        else:
+            subdata = self.replay_buffers[group].sample()
+        subdata = self.algorithm.process_sampled_batch(group, subdata)
         loss_vals = self.losses[group](subdata)
         training_td = loss_vals.detach()
         loss_vals = self.algorithm.process_loss_vals(group, loss_vals)
@@ -404,7 +547,8 @@ class Experiment(CallbackNotifier):
 
                 optimizer.step()
                 optimizer.zero_grad()
-        self.replay_buffers[group].update_tensordict_priority(subdata)
+        if not self.on_policy and self.config.off_policy_use_prioritized_replay_buffer:
+            self.replay_buffers[group].update_tensordict_priority(subdata)
         if self.target_updaters[group] is not None:
             self.target_updaters[group].step()
 
@@ -482,12 +626,14 @@ class Experiment(CallbackNotifier):
         self.logger.log(
             {"timers/evaluation_time": evaluation_time}, step=self.n_iters_performed
         )
-        self.logger.log_evaluation(
+        self.mean_eval_return = self.logger.log_evaluation(
             rollouts,
             video_frames=video_frames,
             step=self.n_iters_performed,
             total_frames=self.total_frames,
         )
+        if not self.config.keep_evaluation_env:
+            self._close_test_env()
         # Callback
         self._on_evaluation_end(rollouts)
 
@@ -508,6 +654,11 @@ class Experiment(CallbackNotifier):
                 f"buffer_{k}": item.state_dict()
                 for k, item in self.replay_buffers.items()
             },
+            **{
+                f"optimizer_{k}_{loss_name}": optimizer.state_dict()
+                for k, item in self.optimizers.items()
+                for loss_name, optimizer in item.items()
+            },
         )
         return state_dict
 
@@ -521,6 +672,12 @@ class Experiment(CallbackNotifier):
         for group in self.group_map.keys():
             self.losses[group].load_state_dict(state_dict[f"loss_{group}"])
             self.replay_buffers[group].load_state_dict(state_dict[f"buffer_{group}"])
+            for loss_name, optimizer in self.optimizers[group].items():
+                # Checkpoints from older versions do not contain the optimizers
+                if f"optimizer_{group}_{loss_name}" in state_dict:
+                    optimizer.load_state_dict(
+                        state_dict[f"optimizer_{group}_{loss_name}"]
+                    )
         self.collector.load_state_dict(state_dict["collector"])
         self.total_time = state_dict["state"]["total_time"]
         self.total_frames = state_dict["state"]["total_frames"]
@@ -157,11 +157,11 @@ class Logger:
         total_frames: int,
         step: int,
         video_frames: Optional[List] = None,
-    ):
+    ) -> Optional[float]:
         if (
             not len(self.loggers) and not self.experiment_config.create_json
         ) or not len(rollouts):
-            return
+            return None
         to_log = {}
         json_metrics = {}
         for group in self.group_map.keys():
@@ -234,6 +234,7 @@ class Logger:
                     logger.log_video("eval/video", vid, fps=20, commit=False)
                 else:
                     logger.log_video("eval_video", vid, step=step)
+        return mean_group_return.mean().item()
 
     def commit(self):
         for logger in self.loggers:
@@ -313,12 +314,20 @@ class JsonWriter:
         seed: int,
     ):
         self.path = Path(folder) / Path(name)
-        self.run_data = {"absolute_metrics": {}}
-        self.data = {
-            environment_name: {
-                task_name: {algorithm_name: {f"seed_{seed}": self.run_data}}
+        if self.path.exists():
+            # The experiment has been restored, we keep appending to its file
+            with open(self.path, "r") as f:
+                self.data = json.load(f)
+            self.run_data = self.data[environment_name][task_name][algorithm_name][
+                f"seed_{seed}"
+            ]
+        else:
+            self.run_data = {"absolute_metrics": {}}
+            self.data = {
+                environment_name: {
+                    task_name: {algorithm_name: {f"seed_{seed}": self.run_data}}
+                }
             }
-        }
 
     def write(
         self, total_frames: int, metrics: Dict[str, List[Tensor]], evaluation_step: int
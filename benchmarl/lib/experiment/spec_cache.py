@@ -0,0 +1,133 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import torch
+
+from benchmarl.conf.environment import Task
+from benchmarl.lib.models.common import ModelConfig
+from benchmarl.lib.utils import DEVICE_TYPING
+from torchrl.data import CompositeSpec
+from torchrl.envs import EnvBase, Transform
+
+
+@dataclass
+class TaskSpecs:
+    """The specs of a task, which are all that experiments need from an environment to be set up."""
+
+    observation_spec: CompositeSpec
+    info_spec: Optional[CompositeSpec]
+    state_spec: Optional[CompositeSpec]
+    action_mask_spec: Optional[CompositeSpec]
+    action_spec: CompositeSpec
+    group_map: Dict[str, List[str]]
+    max_steps: int
+    reward_sum_transform: Transform
+    # Whether the environment is vectorized (has a non-empty batch_size)
+    batched: bool
+
+    @classmethod
+    def from_env(cls, task: Task, env: EnvBase) -> TaskSpecs:
+        """
+        Reads the specs of a task from one of its environments.
+
+        Args:
+            task (Task): the task
+            env (EnvBase): an environment created via task.get_env_fun
+        """
+        return cls(
+            observation_spec=task.observation_spec(env),
+            info_spec=task.info_spec(env),
+            state_spec=task.state_spec(env),
+            action_mask_spec=task.action_mask_spec(env),
+            action_spec=task.action_spec(env),
+            group_map=task.group_map(env),
+            max_steps=task.max_steps(env),
+            reward_sum_transform=task.get_reward_sum_transform(env),
+            batched=env.batch_size != (),
+        )
+
+
+class SpecCache:
+    """An on-disk cache of task specs.
+
+    Specs are keyed by the task (environment, name and config), the action type,
+    the model config (which can change the environment through ``process_env_fun``)
+    and the sampling device (the device of the environments and of their specs).
+    They do not depend on the number of vectorized environments, so the specs
+    cached by one experiment can be used by all experiments on the same task.
+
+    Args:
+        folder (str): the folder where the specs are stored
+    """
+
+    def __init__(self, folder: str):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(
+        task: Task,
+        continuous_actions: bool,
+        model_config: ModelConfig,
+        device: DEVICE_TYPING,
+    ) -> str:
+        """The key of the specs of a task."""
+        key_dict = {
+            "env": task.env_name(),
+            "name": task.name.lower(),
+            "config": task.config,
+            "continuous_actions": continuous_actions,
+            "model": f"{type(model_config).__module__}.{type(model_config).__qualname__}",
+            "model_config": dataclasses.asdict(model_config),
+            "device": str(torch.device(device)),
+        }
+        key_string = json.dumps(key_dict, sort_keys=True, default=str)
+        return hashlib.sha256(key_string.encode()).hexdigest()[:16]
+
+    def _path(self, key: str) -> Path:
+        return self.folder / f"specs_{key}.pt"
+
+    def get(
+        self,
+        task: Task,
+        continuous_actions: bool,
+        model_config: ModelConfig,
+        device: DEVICE_TYPING,
+    ) -> Optional[TaskSpecs]:
+        """
+        Loads the specs of a task.
+
+        Returns: the cached specs or None if the task has not been cached
+        """
+        path = self._path(self.key(task, continuous_actions, model_config, device))
+        if not path.exists():
+            return None
+        return torch.load(path, map_location=device)
+
+    def put(
+        self,
+        task: Task,
+        continuous_actions: bool,
+        model_config: ModelConfig,
+        device: DEVICE_TYPING,
+        specs: TaskSpecs,
+    ) -> None:
+        """Stores the specs of a task."""
+        path = self._path(self.key(task, continuous_actions, model_config, device))
+        # Write and rename so that concurrent experiments never read a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        torch.save(specs, tmp_path)
+        tmp_path.replace(path)
@@ -4,15 +4,33 @@
 #  LICENSE file in the root directory of this source tree.
 #
 
-from benchmarl.conf.model.gnn import GnnConfig
 from benchmarl.conf.model.mlp import MlpConfig
+from benchmarl.lib.utils import _class_from_name, _LazyRegistry
 
 from .common import Model, ModelConfig, SequenceModel, SequenceModelConfig
-from .gnn import Gnn
 from .mlp import Mlp
 
 classes = ["Mlp", "MlpConfig", "Gnn", "GnnConfig"]
 
-model_config_registry = {"mlp": MlpConfig, "gnn": GnnConfig}
+# The Gnn depends on the optional torch_geometric, which is slow to import,
+# so it is only imported when first used
+_lazy_classes = {
+    "Gnn": "benchmarl.lib.models.gnn.Gnn",
+    "GnnConfig": "benchmarl.conf.model.gnn.GnnConfig",
+}
 
-__all__ = [Model, ModelConfig, SequenceModel, SequenceModelConfig, Gnn, Mlp]
+model_config_registry = _LazyRegistry(
+    {
+        "mlp": "benchmarl.conf.model.mlp.MlpConfig",
+        "gnn": "benchmarl.conf.model.gnn.GnnConfig",
+    }
+)
+
+
+def __getattr__(name: str):
+    if name in _lazy_classes:
+        return _class_from_name(_lazy_classes[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [Model, ModelConfig, SequenceModel, SequenceModelConfig, Mlp]
@@ -9,9 +9,13 @@ from abc import ABC, abstractmethod
 from dataclasses import asdict, dataclass
 from typing import Any, Callable, Dict, List, Optional, Sequence
 
+import torch
+import torch.utils.checkpoint
+from torch import nn
+
 from benchmarl.lib.utils import _class_from_name, _read_yaml_config, DEVICE_TYPING
 
-from tensordict import TensorDictBase
+from tensordict import TensorDict, TensorDictBase
 from tensordict.nn import TensorDictModuleBase, TensorDictSequential
 from torchrl.data import CompositeSpec, UnboundedContinuousTensorSpec
 from torchrl.envs import EnvBase
@@ -46,6 +50,74 @@ def output_has_agent_dim(share_params: bool, centralised: bool) -> bool:
         return True
 
 
+def agent_chunks_forward(
+    forward: Callable[..., torch.Tensor],
+    agent_modules: Callable[[int, int], nn.Module],
+    n_agents: int,
+    agent_chunk_size: Optional[int],
+    checkpoint_agent_chunks: bool,
+    *args,
+) -> torch.Tensor:
+    """
+    Evaluates a model on chunks of agents and concatenates the outputs along the agent dimension.
+
+    Args:
+        forward (callable): called as ``forward(*args, start, end)``, it returns the output of the agents
+            in ``[start, end)`` with the agent dimension in position -2
+        agent_modules (callable): called as ``agent_modules(start, end)``, it returns the module holding
+            the parameters used by ``forward(*args, start, end)``
+        n_agents (int): the number of agents
+        agent_chunk_size (int, optional): the number of agents per chunk, all agents by default
+        checkpoint_agent_chunks (bool): whether the activations of each chunk are recomputed in the backward pass
+            instead of being stored, so that only the activations of one chunk at a time are in memory.
+            It has no effect inside functorch transforms (e.g., :func:`torch.vmap`)
+        *args: the inputs of ``forward``
+
+    """
+    agent_chunk_size = agent_chunk_size or n_agents
+    # Checkpointing is not supported inside functorch transforms (e.g., torch.vmap)
+    checkpoint_agent_chunks = (
+        checkpoint_agent_chunks
+        and torch.is_grad_enabled()
+        and torch._C._functorch.peek_interpreter_stack() is None
+    )
+    chunks = []
+    for start in range(0, n_agents, agent_chunk_size):
+        end = min(start + agent_chunk_size, n_agents)
+        if checkpoint_agent_chunks:
+            chunks.append(
+                torch.utils.checkpoint.checkpoint(
+                    _with_current_params(forward, agent_modules(start, end)),
+                    *args,
+                    start,
+                    end,
+                    use_reentrant=False,
+                )
+            )
+        else:
+            chunks.append(forward(*args, start, end))
+    return torch.cat(chunks, dim=-2) if len(chunks) > 1 else chunks[0]
+
+
+def _with_current_params(
+    forward: Callable[..., torch.Tensor], module: nn.Module
+) -> Callable[..., torch.Tensor]:
+    # The recomputation of checkpoints uses the current parameters of the module,
+    # even if they are swapped out of it before the backward pass (e.g., by functional losses)
+    params = TensorDict.from_module(module)
+
+    def forward_with_params(*args):
+        # The recomputation can be stopped early by an error raised inside forward,
+        # so the parameters of the module are restored explicitly
+        previous_params = params.to_module(module, return_swap=True)
+        try:
+            return forward(*args)
+        finally:
+            previous_params.to_module(module)
+
+    return forward_with_params
+
+
 class Model(TensorDictModuleBase, ABC):
     """
     Abstract class representing a model.
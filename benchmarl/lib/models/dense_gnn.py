@@ -0,0 +1,109 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+"""Dense forward of graph convolutions on small graphs.
+
+The node features keep their dense agent dimension, of shape ``(*batch, n_agents, features)``,
+and messages are aggregated with batched matrix multiplications against an adjacency tensor,
+instead of batching the graphs into sparse edge lists and scattering messages.
+The convolutions are the torch_geometric modules (with their parameters), but only their layers are called.
+"""
+
+from __future__ import annotations
+
+import torch
+from torch import nn, Tensor
+
+# Aggregations of GraphConv supported by the dense forward
+DENSE_GRAPH_CONV_AGGREGATIONS = {"add", "sum", "mean"}
+
+
+def supports_dense(conv: nn.Module) -> bool:
+    """Whether the dense forward supports a convolution."""
+    name = type(conv).__name__
+    if name == "GraphConv":
+        return conv.aggr in DENSE_GRAPH_CONV_AGGREGATIONS
+    if name == "GATv2Conv":
+        return conv.edge_dim is None
+    return False
+
+
+def get_dense_adjacency(conv: nn.Module, edge_index: Tensor, n_agents: int) -> Tensor:
+    """
+    The adjacency tensor of shape ``(n_agents, n_agents)`` used in the dense forward of a convolution,
+    where ``adjacency[i, j]`` is 1 if node ``i`` receives messages from node ``j``.
+    """
+    adjacency = torch.zeros(n_agents, n_agents, device=edge_index.device)
+    adjacency[edge_index[1], edge_index[0]] = 1
+    return add_conv_self_loops(conv, adjacency)
+
+
+def add_conv_self_loops(conv: nn.Module, adjacency: Tensor) -> Tensor:
+    """Adds to an adjacency tensor the self loops that a convolution adds to its input graph."""
+    if type(conv).__name__ == "GATv2Conv" and conv.add_self_loops:
+        adjacency.diagonal(dim1=-2, dim2=-1).fill_(1)
+    return adjacency
+
+
+def dense_forward(
+    conv: nn.Module, x: Tensor, x_target: Tensor, adjacency: Tensor
+) -> Tensor:
+    """
+    Dense forward of a convolution supported by :func:`supports_dense`.
+
+    Args:
+        conv (nn.Module): the convolution
+        x (Tensor): the features of all the nodes, of shape ``(*batch, n_agents, in_features)``
+        x_target (Tensor): the features of the nodes to compute the output of, of shape
+            ``(*batch, n_targets, in_features)``
+        adjacency (Tensor): the rows of the adjacency tensor of the target nodes,
+            of shape ``(*batch, n_targets, n_agents)`` (the batch dimensions can be omitted)
+
+    Returns: the output of the target nodes, of shape ``(*batch, n_targets, out_features)``
+    """
+    if type(conv).__name__ == "GraphConv":
+        return _dense_graph_conv(conv, x, x_target, adjacency)
+    return _dense_gatv2_conv(conv, x, x_target, adjacency)
+
+
+def _dense_graph_conv(
+    conv: nn.Module, x: Tensor, x_target: Tensor, adjacency: Tensor
+) -> Tensor:
+    aggregated = torch.matmul(adjacency, x)
+    if conv.aggr == "mean":
+        # Nodes without neighbours aggregate to zero, as in message passing
+        aggregated = aggregated / adjacency.sum(-1, keepdim=True).clamp(min=1)
+    return conv.lin_rel(aggregated) + conv.lin_root(x_target)
+
+
+def _dense_gatv2_conv(
+    conv: nn.Module, x: Tensor, x_target: Tensor, adjacency: Tensor
+) -> Tensor:
+    heads, channels = conv.heads, conv.out_channels
+    x_source = conv.lin_l(x).unflatten(-1, (heads, channels))
+    x_target_heads = (conv.lin_l if conv.share_weights else conv.lin_r)(
+        x_target
+    ).unflatten(-1, (heads, channels))
+
+    # Attention logits of shape (*batch, n_targets, n_agents, heads)
+    logits = nn.functional.leaky_relu(
+        x_target_heads.unsqueeze(-3) + x_source.unsqueeze(-4), conv.negative_slope
+    )
+    logits = (logits * conv.att.view(heads, channels)).sum(-1)
+
+    # Softmax over the neighbours of each target, nodes without neighbours get no attention
+    mask = adjacency.unsqueeze(-1) > 0
+    logits = logits.masked_fill(~mask, torch.finfo(logits.dtype).min)
+    alpha = torch.softmax(logits, dim=-2) * mask
+    alpha = nn.functional.dropout(alpha, p=conv.dropout, training=conv.training)
+
+    out = torch.einsum("...tsh,...shc->...thc", alpha, x_source)
+    out = out.flatten(-2) if conv.concat else out.mean(-2)
+    if getattr(conv, "res", None) is not None:
+        out = out + conv.res(x_target)
+    if conv.bias is not None:
+        out = out + conv.bias
+    return out
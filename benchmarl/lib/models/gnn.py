@@ -7,48 +7,148 @@
 from __future__ import annotations
 
 import importlib
+import inspect
+from collections import OrderedDict
 from math import prod
-from typing import Optional, Type
+from typing import List, Optional, Tuple, Type
 
 import torch
 
-from benchmarl.lib.models.common import Model
+from benchmarl.lib.models.common import agent_chunks_forward, Model
+from benchmarl.lib.models.dense_gnn import (
+    add_conv_self_loops,
+    dense_forward,
+    get_dense_adjacency,
+    supports_dense,
+)
+from benchmarl.lib.models.spatial_graphs import (
+    dense_knn_adjacency,
+    dense_radius_adjacency,
+    knn_graph,
+    padded_radius_graph,
+    radius_graph,
+)
 from tensordict import TensorDictBase
 from torch import nn, Tensor
+from torch._C._functorch import is_batchedtensor
 
 _has_torch_geometric = importlib.util.find_spec("torch_geometric") is not None
 if _has_torch_geometric:
     import torch_geometric
 
-TOPOLOGY_TYPES = {"full", "empty"}
+TOPOLOGY_TYPES = {"full", "empty", "radius", "knn"}
+# Topologies built at each forward from the agent positions in the input
+SPATIAL_TOPOLOGY_TYPES = {"radius", "knn"}
+
+# Aggregations of GraphConv computed with dense per-graph reductions on the full topology
+DENSE_FULL_GRAPH_AGGREGATIONS = {"add", "sum", "mean"}
+
+# Number of batch sizes for which the batched edge indices are cached by a Gnn
+BATCH_EDGE_INDEX_CACHE_SIZE = 4
+
+# Convolutions whose output for a node only depends on the node features and on the messages it receives.
+# With non-shared parameters, they are run on the subgraph of each agent instead of on the whole graph.
+LOCAL_GNN_CLASSES = {
+    "EdgeConv",
+    "FiLMConv",
+    "GATConv",
+    "GATv2Conv",
+    "GeneralConv",
+    "GINConv",
+    "GraphConv",
+    "LEConv",
+    "MFConv",
+    "ResGatedGraphConv",
+    "SAGEConv",
+    "TransformerConv",
+}
+
+
+def _get_edge_feature_key(gnn_class: Type) -> Optional[str]:
+    # The forward argument of a gnn conv class that takes the edge lengths as edge features, if any
+    parameters = inspect.signature(gnn_class.forward).parameters
+    for key in ("edge_weight", "edge_attr"):
+        if key in parameters:
+            return key
+    return None
 
 
 def _get_edge_index(topology: str, self_loops: bool, n_agents: int, device: str):
     if topology == "full":
         adjacency = torch.ones(n_agents, n_agents, device=device, dtype=torch.long)
     elif topology == "empty":
-        adjacency = torch.ones(n_agents, n_agents, device=device, dtype=torch.long)
+        adjacency = torch.zeros(n_agents, n_agents, device=device, dtype=torch.long)
 
     edge_index, _ = torch_geometric.utils.dense_to_sparse(adjacency)
 
+    # The adjacency can already contain self loops, which should not be duplicated
+    edge_index, _ = torch_geometric.utils.remove_self_loops(edge_index)
     if self_loops:
-        edge_index, _ = torch_geometric.utils.add_self_loops(edge_index)
-    else:
-        edge_index, _ = torch_geometric.utils.remove_self_loops(edge_index)
+        edge_index, _ = torch_geometric.utils.add_self_loops(
+            edge_index, num_nodes=n_agents
+        )
 
     return edge_index
 
 
+def _get_agent_subgraphs(
+    edge_index: Tensor, n_agents: int
+) -> List[Tuple[Tensor, Tensor, int]]:
+    """
+    For each agent, the subgraph made of its node, the nodes sending messages to it and the edges between them.
+    Returns a list of tuples ``(nodes, edge_index, position)``, where ``nodes`` are the agent indices of the
+    subgraph nodes, ``edge_index`` is relabelled to the subgraph nodes and ``position`` is the one of the agent.
+    """
+    subgraphs = []
+    for agent in range(n_agents):
+        incoming = edge_index[:, edge_index[1] == agent]
+        nodes = torch.unique(
+            torch.cat([incoming[0], torch.tensor([agent], device=edge_index.device)])
+        )
+        relabel = torch.full((n_agents,), -1, dtype=torch.long, device=nodes.device)
+        relabel[nodes] = torch.arange(len(nodes), device=nodes.device)
+        subgraphs.append((nodes, relabel[incoming], relabel[agent].item()))
+    return subgraphs
+
+
 class Gnn(Model):
     """A GNN model.
 
     GNN models can be used as "decentralized" actors or critics.
 
+    When parameters are not shared and ``gnn_class`` is in ``LOCAL_GNN_CLASSES``, the gnn of each agent
+    is only run on the subgraph of the agent (its node and the edges it receives messages from).
+    A ``GraphConv`` with an aggregation in ``DENSE_FULL_GRAPH_AGGREGATIONS`` on the "full" topology
+    is computed with dense per-graph reductions, without message passing.
+    Otherwise, groups of at most ``dense_max_agents`` agents use the dense forward of
+    :mod:`benchmarl.lib.models.dense_gnn` when it supports ``gnn_class`` (``GraphConv`` and ``GATv2Conv``).
+
     Args:
-        topology (str): Topology of the graph adjacency matrix. Options: "full", "empty".
+        topology (str): Topology of the graph adjacency matrix. Options: "full", "empty", "radius", "knn".
+            "radius" connects the agents within ``edge_radius`` of each other and "knn" connects each agent
+            to its ``n_neighbours`` nearest agents, both are built at each forward from the agent positions.
+            Inside :func:`torch.vmap` (used by torchrl to compute values), these graphs are built with fixed shapes
+            and the gnn conv class must support batched edge indices (e.g., ``GraphConv`` and ``GATv2Conv``).
         self_loops (str): Whether the resulting adjacency matrix will have self loops.
         gnn_class (Type[torch_geometric.nn.MessagePassing]): the gnn convolution class to use
         gnn_kwargs (dict, optional): the dict of arguments to pass to the gnn conv class
+        position_indices (list of int, optional): the indices of the input features holding the agent position,
+            needed by the "radius" and "knn" topologies
+        edge_radius (float, optional): the radius of the "radius" topology
+        n_neighbours (int, optional): the number of neighbours of the "knn" topology
+        distance_edge_features (bool, optional): whether the edge lengths are passed to the gnn conv
+            with the "radius" and "knn" topologies, as ``edge_weight`` of shape ``(n_edges,)`` for gnn conv classes
+            that take edge weights (e.g., ``GraphConv``), otherwise as ``edge_attr`` of shape ``(n_edges, 1)``
+            (e.g., ``GATv2Conv`` with ``edge_dim=1`` in ``gnn_kwargs``). Defaults to False
+        dense_max_agents (int, optional): groups with at most this number of agents use the dense forward
+            (if the gnn conv class supports it), set it to 0 to always use torch_geometric message passing.
+            Defaults to 32
+        agent_chunk_size (int, optional): if provided, the dense forward computes the output of the agents
+            in chunks of this size, which bounds the size of the intermediate activations
+            (the attention of ``GATv2Conv`` has size ``n_agents ** 2`` per sample)
+        checkpoint_agent_chunks (bool, optional): whether the activations of each chunk of agents of the
+            dense forward are recomputed in the backward pass instead of being stored (all agents are one chunk
+            if ``agent_chunk_size`` is not provided). Defaults to False
 
     Examples:
 
@@ -96,10 +196,26 @@ class Gnn(Model):
         self_loops: bool,
         gnn_class: Type[torch_geometric.nn.MessagePassing],
         gnn_kwargs: Optional[dict] = None,
+        position_indices: Optional[List[int]] = None,
+        edge_radius: Optional[float] = None,
+        n_neighbours: Optional[int] = None,
+        distance_edge_features: bool = False,
+        dense_max_agents: int = 32,
+        agent_chunk_size: Optional[int] = None,
+        checkpoint_agent_chunks: bool = False,
         **kwargs,
     ):
         self.topology = topology
         self.self_loops = self_loops
+        self.gnn_class = gnn_class
+        self.gnn_kwargs = gnn_kwargs
+        self.position_indices = position_indices
+        self.edge_radius = edge_radius
+        self.n_neighbours = n_neighbours
+        self.distance_edge_features = distance_edge_features
+        self.dense_max_agents = dense_max_agents
+        self.agent_chunk_size = agent_chunk_size
+        self.checkpoint_agent_chunks = checkpoint_agent_chunks
 
         super().__init__(**kwargs)
 
@@ -118,12 +234,37 @@ class Gnn(Model):
                 for _ in range(self.n_agents if not self.share_params else 1)
             ]
         )
-        self.edge_index = _get_edge_index(
-            topology=self.topology,
-            self_loops=self.self_loops,
-            device=self.device,
-            n_agents=self.n_agents,
+        self.spatial_topology = self.topology in SPATIAL_TOPOLOGY_TYPES
+        self.dense = (
+            self.n_agents <= self.dense_max_agents
+            and supports_dense(self.gnns[0])
+            and not self.distance_edge_features
         )
+        self.dense_full_graph = (
+            self.topology == "full"
+            and gnn_class.__name__ == "GraphConv"
+            and self.gnns[0].aggr in DENSE_FULL_GRAPH_AGGREGATIONS
+        )
+
+        self.edge_index = None
+        self.agent_subgraphs = None
+        self.dense_adjacency = None
+        if not self.spatial_topology:
+            self.edge_index = _get_edge_index(
+                topology=self.topology,
+                self_loops=self.self_loops,
+                device=self.device,
+                n_agents=self.n_agents,
+            )
+            if not self.share_params and gnn_class.__name__ in LOCAL_GNN_CLASSES:
+                self.agent_subgraphs = _get_agent_subgraphs(
+                    self.edge_index, self.n_agents
+                )
+            if self.dense:
+                self.dense_adjacency = get_dense_adjacency(
+                    self.gnns[0], self.edge_index, self.n_agents
+                )
+        self._batch_edge_indices = OrderedDict()
 
     def _perform_checks(self):
         super()._perform_checks()
@@ -132,6 +273,48 @@ class Gnn(Model):
             raise ValueError(
                 f"Got topology: {self.topology} but only available options are {TOPOLOGY_TYPES}"
             )
+        if self.agent_chunk_size is not None and self.agent_chunk_size < 1:
+            raise ValueError(
+                f"Got agent_chunk_size: {self.agent_chunk_size} but it should be at least 1"
+            )
+        if self.topology in SPATIAL_TOPOLOGY_TYPES:
+            if not self.position_indices:
+                raise ValueError(
+                    f"The {self.topology} topology needs the position_indices of the agent positions in the input"
+                )
+            if max(self.position_indices) >= self.input_leaf_spec.shape[-1]:
+                raise ValueError(
+                    f"Got position_indices: {self.position_indices} but the input has only "
+                    f"{self.input_leaf_spec.shape[-1]} features"
+                )
+        if self.topology == "radius" and (
+            self.edge_radius is None or self.edge_radius <= 0
+        ):
+            raise ValueError("The radius topology needs a positive edge_radius")
+        if self.topology == "knn" and (
+            self.n_neighbours is None or self.n_neighbours < 1
+        ):
+            raise ValueError("The knn topology needs a positive n_neighbours")
+        if self.distance_edge_features:
+            if self.topology not in SPATIAL_TOPOLOGY_TYPES:
+                raise ValueError(
+                    f"Distance edge features are only available with the {SPATIAL_TOPOLOGY_TYPES} topologies"
+                )
+            edge_feature_key = _get_edge_feature_key(self.gnn_class)
+            if edge_feature_key is None:
+                raise ValueError(
+                    f"Distance edge features need a gnn conv class that takes edge_weight or edge_attr, "
+                    f"but {self.gnn_class.__name__} takes neither"
+                )
+            if (
+                edge_feature_key == "edge_attr"
+                and "edge_dim" in inspect.signature(self.gnn_class.__init__).parameters
+                and (self.gnn_kwargs or {}).get("edge_dim") != 1
+            ):
+                raise ValueError(
+                    f"Distance edge features are passed to {self.gnn_class.__name__} as edge_attr "
+                    f"with one feature, set edge_dim=1 in gnn_kwargs"
+                )
         if self.centralised:
             raise ValueError("GNN model can only be used in non-centralised critics")
         if not self.input_has_agent_dim:
@@ -160,16 +343,48 @@ class Gnn(Model):
 
         batch_size = input.shape[:-2]
 
-        graph = batch_from_dense_to_ptg(x=input, edge_index=self.edge_index)
+        if self.dense_full_graph:
+            tensordict.set(self.out_key, self._dense_full_graph_forward(input))
+            return tensordict
 
-        if not self.share_params:
+        if self.dense:
+            adjacency = (
+                self._get_spatial_adjacency(input)
+                if self.spatial_topology
+                else self.dense_adjacency
+            )
+            tensordict.set(self.out_key, self._dense_forward(input, adjacency))
+            return tensordict
+
+        if self.spatial_topology:
+            tensordict.set(self.out_key, self._spatial_forward(input))
+            return tensordict
+
+        batch_edge_indices = self._get_batch_edge_indices(
+            prod(batch_size), input.device
+        )
+
+        if self.agent_subgraphs is not None:
+            # Each agent gnn only computes the output of its own node
+            res = torch.stack(
+                [
+                    self._subgraph_forward(gnn, input, nodes, edge_index, position)
+                    for gnn, (nodes, _, position), edge_index in zip(
+                        self.gnns, self.agent_subgraphs, batch_edge_indices
+                    )
+                ],
+                dim=-2,
+            )
+
+        elif not self.share_params:
+            x = input.reshape(-1, self.input_features)
             res = torch.stack(
                 [
-                    gnn(graph.x, graph.edge_index).view(
+                    gnn(x, batch_edge_indices[0]).view(
                         *batch_size,
                         self.n_agents,
                         self.output_features,
-                    )[:, i]
+                    )[..., i, :]
                     for i, gnn in enumerate(self.gnns)
                 ],
                 dim=-2,
@@ -177,13 +392,195 @@ class Gnn(Model):
 
         else:
             res = self.gnns[0](
-                graph.x,
-                graph.edge_index,
+                input.reshape(-1, self.input_features),
+                batch_edge_indices[0],
             ).view(*batch_size, self.n_agents, self.output_features)
 
         tensordict.set(self.out_key, res)
         return tensordict
 
+    def _dense_full_graph_forward(self, input: Tensor) -> Tensor:
+        """
+        GraphConv on the full topology, where the messages received by a node are the features of all the
+        other nodes (and its own with self loops), so their sum is the per-graph sum minus the node term.
+        This is linear in the number of agents, while message passing over the n_agents^2 edges is quadratic.
+        """
+        aggregated = input.sum(-2, keepdim=True)
+        n_neighbours = self.n_agents
+        if not self.self_loops:
+            aggregated = aggregated - input
+            n_neighbours -= 1
+        else:
+            aggregated = aggregated.expand_as(input)
+        if self.gnns[0].aggr == "mean":
+            # Nodes without neighbours aggregate to zero, as in message passing
+            aggregated = aggregated / max(n_neighbours, 1)
+
+        if self.share_params:
+            return self.gnns[0].lin_rel(aggregated) + self.gnns[0].lin_root(input)
+        return torch.stack(
+            [
+                gnn.lin_rel(aggregated[..., i, :]) + gnn.lin_root(input[..., i, :])
+                for i, gnn in enumerate(self.gnns)
+            ],
+            dim=-2,
+        )
+
+    def _dense_forward(self, input: Tensor, adjacency: Tensor) -> Tensor:
+        return agent_chunks_forward(
+            self._dense_agents_forward,
+            self._agent_gnns,
+            self.n_agents,
+            self.agent_chunk_size,
+            self.checkpoint_agent_chunks,
+            input,
+            adjacency,
+        )
+
+    def _agent_gnns(self, start: int, end: int) -> nn.Module:
+        # The gnns of the agents in [start, end)
+        return self.gnns if self.share_params else self.gnns[start:end]
+
+    def _dense_agents_forward(
+        self, input: Tensor, adjacency: Tensor, start: int, end: int
+    ) -> Tensor:
+        # The output of the agents in [start, end)
+        if self.share_params:
+            return dense_forward(
+                self.gnns[0],
+                input,
+                input[..., start:end, :],
+                adjacency[..., start:end, :],
+            )
+        # Each agent gnn only computes the output of its own node
+        return torch.stack(
+            [
+                dense_forward(
+                    self.gnns[i],
+                    input,
+                    input[..., i : i + 1, :],
+                    adjacency[..., i : i + 1, :],
+                )[..., 0, :]
+                for i in range(start, end)
+            ],
+            dim=-2,
+        )
+
+    def _spatial_forward(self, input: Tensor) -> Tensor:
+        batch_size = input.shape[:-2]
+        x = input.reshape(-1, self.input_features)
+        pos = self._get_positions(input)
+        in_vmap = is_batchedtensor(pos)
+        # Inside torch.vmap the gnn cannot remove the self loops of the graph before adding its own
+        # (this needs boolean masking), so they are added here to a graph without self loops
+        conv_self_loops = in_vmap and getattr(self.gnns[0], "add_self_loops", False)
+        self_loops = self.self_loops and not conv_self_loops
+        # Inside torch.vmap the radius graph needs a fixed shape: all the pairs of agents are edges
+        # and the ones out of radius go to an extra node, whose output is discarded
+        padded = self.topology == "radius" and in_vmap
+        if padded:
+            edge_index, distance = padded_radius_graph(
+                pos, self.edge_radius, self_loops
+            )
+            x = torch.cat([x, x.new_zeros(1, self.input_features)])
+        elif self.topology == "radius":
+            edge_index, distance = radius_graph(pos, self.edge_radius, self_loops)
+        else:
+            edge_index, distance = knn_graph(pos, self.n_neighbours, self_loops)
+        edge_features = None
+        if self.distance_edge_features:
+            edge_feature_key = _get_edge_feature_key(self.gnn_class)
+            edge_features = (
+                distance
+                if edge_feature_key == "edge_weight"
+                else distance.unsqueeze(-1)
+            )
+        if conv_self_loops:
+            edge_index, edge_features = torch_geometric.utils.add_self_loops(
+                edge_index,
+                edge_features,
+                fill_value=getattr(self.gnns[0], "fill_value", None),
+                num_nodes=len(x),
+            )
+        kwargs = (
+            {edge_feature_key: edge_features} if self.distance_edge_features else {}
+        )
+
+        def gnn_forward(gnn: nn.Module) -> Tensor:
+            if conv_self_loops:
+                gnn.add_self_loops = False
+            try:
+                res = gnn(x, edge_index, **kwargs)
+            finally:
+                if conv_self_loops:
+                    gnn.add_self_loops = True
+            if padded:
+                res = res[:-1]
+            return res.view(*batch_size, self.n_agents, self.output_features)
+
+        if self.share_params:
+            return gnn_forward(self.gnns[0])
+        return torch.stack(
+            [gnn_forward(gnn)[..., i, :] for i, gnn in enumerate(self.gnns)],
+            dim=-2,
+        )
+
+    def _get_spatial_adjacency(self, input: Tensor) -> Tensor:
+        pos = self._get_positions(input)
+        if self.topology == "radius":
+            adjacency = dense_radius_adjacency(pos, self.edge_radius, self.self_loops)
+        else:
+            adjacency = dense_knn_adjacency(pos, self.n_neighbours, self.self_loops)
+        adjacency = add_conv_self_loops(self.gnns[0], adjacency)
+        return adjacency.view(*input.shape[:-2], self.n_agents, self.n_agents)
+
+    def _get_positions(self, input: Tensor) -> Tensor:
+        # Positions of shape (n_graphs, n_agents, n_dims)
+        return input[..., self.position_indices].reshape(
+            -1, self.n_agents, len(self.position_indices)
+        )
+
+    def _subgraph_forward(
+        self,
+        gnn: nn.Module,
+        input: Tensor,
+        nodes: Tensor,
+        batch_edge_index: Tensor,
+        position: int,
+    ) -> Tensor:
+        x = input.index_select(-2, nodes).reshape(-1, self.input_features)
+        return gnn(x, batch_edge_index).view(
+            *input.shape[:-2], len(nodes), self.output_features
+        )[..., position, :]
+
+    def _get_batch_edge_indices(
+        self, batch_size: int, device: torch.device
+    ) -> List[Tensor]:
+        """
+        The edge indices of the graphs used in the forward (the whole graph or the agent subgraphs),
+        batched ``batch_size`` times.
+        They are kept in a least recently used cache of ``BATCH_EDGE_INDEX_CACHE_SIZE`` batch sizes,
+        so that they are not rebuilt at every forward for the common batch sizes.
+        """
+        key = (batch_size, device)
+        batch_edge_indices = self._batch_edge_indices.pop(key, None)
+        if batch_edge_indices is None:
+            if self.agent_subgraphs is not None:
+                graphs = [
+                    (edge_index, len(nodes))
+                    for nodes, edge_index, _ in self.agent_subgraphs
+                ]
+            else:
+                graphs = [(self.edge_index, self.n_agents)]
+            batch_edge_indices = [
+                _batch_edge_index(edge_index.to(device), n_nodes, batch_size)
+                for edge_index, n_nodes in graphs
+            ]
+        self._batch_edge_indices[key] = batch_edge_indices
+        if len(self._batch_edge_indices) > BATCH_EDGE_INDEX_CACHE_SIZE:
+            self._batch_edge_indices.popitem(last=False)
+        return batch_edge_indices
+
 
 # class GnnKernel(nn.Module):
 #     def __init__(self, in_dim, out_dim, **cfg):
@@ -231,6 +628,14 @@ class Gnn(Model):
 #         return out
 
 
+def _batch_edge_index(edge_index: Tensor, n_nodes: int, batch_size: int) -> Tensor:
+    # Edge index for the batched graphs of shape [2, n_edges * batch_size]
+    # we sum to each batch an offset of batch_num * n_nodes to make sure that
+    # the adjacency matrices remain independent
+    offset = torch.arange(batch_size, device=edge_index.device) * n_nodes
+    return (edge_index.unsqueeze(1) + offset.unsqueeze(-1)).view(2, -1)
+
+
 def batch_from_dense_to_ptg(
     x: Tensor,
     edge_index: Tensor,
@@ -247,15 +652,7 @@ def batch_from_dense_to_ptg(
     graphs.x = x
     graphs.edge_attr = None
 
-    n_edges = edge_index.shape[1]
-    # Tensor of shape [batch_size * n_edges]
-    # in which edges corresponding to the same graph have the same index.
-    batch = torch.repeat_interleave(b, n_edges)
-    # Edge index for the batched graphs of shape [2, n_edges * batch_size]
-    # we sum to each batch an offset of batch_num * n_agents to make sure that
-    # the adjacency matrices remain independent
-    batch_edge_index = edge_index.repeat(1, batch_size) + batch * n_agents
-    graphs.edge_index = batch_edge_index
+    graphs.edge_index = _batch_edge_index(edge_index, n_agents, batch_size)
 
     graphs = graphs.to(x.device)
 
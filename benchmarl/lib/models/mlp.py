@@ -6,9 +6,11 @@
 
 from __future__ import annotations
 
+from typing import List, Optional, Sequence, Tuple, Union
+
 import torch
 
-from benchmarl.lib.models.common import Model
+from benchmarl.lib.models.common import agent_chunks_forward, Model
 from tensordict import TensorDictBase
 from torch import nn
 from torchrl.modules import MLP, MultiAgentMLP
@@ -26,13 +28,34 @@ class Mlp(Model):
         activation_kwargs (dict, optional): kwargs to be used with the activation class;
         norm_class (Type, optional): normalization class, if any.
         norm_kwargs (dict, optional): kwargs to be used with the normalization layers;
+        shared_trunk (bool, optional): only used by centralised models without parameter sharing. If ``True``,
+            the input of all agents is encoded once by a trunk with the layers in ``num_cells``,
+            shared by all agents, followed by a linear output head per agent.
+            Otherwise, each agent has its own network reading the input of all agents. Defaults to ``False``.
+        agent_chunk_size (int, optional): if provided, the agents are evaluated in chunks of this size,
+            which bounds the size of the intermediate activations.
+            Only used by models whose output has the agent dimension and without ``shared_trunk``.
+        checkpoint_agent_chunks (bool, optional): whether the activations of each chunk of agents are
+            recomputed in the backward pass instead of being stored (all agents are one chunk if
+            ``agent_chunk_size`` is not provided). Defaults to ``False``.
+        agent_embedding_dim (int, optional): only used by models without parameter sharing and without
+            ``shared_trunk``. If provided, the agents share one network whose input is extended with
+            a learned embedding of this size for each agent, instead of having one network each.
 
     """
 
     def __init__(
         self,
+        shared_trunk: bool = False,
+        agent_chunk_size: Optional[int] = None,
+        checkpoint_agent_chunks: bool = False,
+        agent_embedding_dim: Optional[int] = None,
         **kwargs,
     ):
+        self.agent_chunk_size = agent_chunk_size
+        self.checkpoint_agent_chunks = checkpoint_agent_chunks
+        self.agent_embedding_dim = agent_embedding_dim
+
         super().__init__(
             input_spec=kwargs.pop("input_spec"),
             output_spec=kwargs.pop("output_spec"),
@@ -47,8 +70,42 @@ class Mlp(Model):
 
         self.input_features = self.input_leaf_spec.shape[-1]
         self.output_features = self.output_leaf_spec.shape[-1]
+        self.shared_trunk = shared_trunk and self.centralised and not self.share_params
+        self.agent_embedding = (
+            self.agent_embedding_dim is not None
+            and not self.share_params
+            and not self.shared_trunk
+        )
+        self.chunk_agents = (
+            self.agent_chunk_size is not None or self.checkpoint_agent_chunks
+        ) and (self.output_has_agent_dim and not self.shared_trunk)
 
-        if self.input_has_agent_dim:
+        if self.shared_trunk:
+            self.mlp = _SharedTrunkMLP(
+                in_features=self.input_features
+                * (self.n_agents if self.input_has_agent_dim else 1),
+                out_features=self.output_features,
+                n_agents=self.n_agents,
+                device=self.device,
+                **kwargs,
+            )
+            self._print_shared_trunk_savings()
+        elif self.agent_embedding:
+            self.mlp = _AgentEmbeddingMLP(
+                in_features=self.input_features
+                * (
+                    self.n_agents
+                    if self.centralised and self.input_has_agent_dim
+                    else 1
+                ),
+                out_features=self.output_features,
+                n_agents=self.n_agents,
+                embedding_dim=self.agent_embedding_dim,
+                shared_input=self.centralised,
+                device=self.device,
+                **kwargs,
+            )
+        elif self.input_has_agent_dim:
             self.mlp = MultiAgentMLP(
                 n_agent_inputs=self.input_features,
                 n_agent_outputs=self.output_features,
@@ -70,10 +127,26 @@ class Mlp(Model):
                     for _ in range(self.n_agents if not self.share_params else 1)
                 ]
             )
+            if (
+                self.n_agents > 1
+                and not self.share_params
+                and _StackedMLP.can_stack(self.mlp[0])
+            ):
+                # The agent networks read the same input, so they are evaluated together
+                self.mlp = _StackedMLP(list(self.mlp))
 
     def _perform_checks(self):
         super()._perform_checks()
 
+        if self.agent_chunk_size is not None and self.agent_chunk_size < 1:
+            raise ValueError(
+                f"Got agent_chunk_size: {self.agent_chunk_size} but it should be at least 1"
+            )
+        if self.agent_embedding_dim is not None and self.agent_embedding_dim < 1:
+            raise ValueError(
+                f"Got agent_embedding_dim: {self.agent_embedding_dim} but it should be at least 1"
+            )
+
         if self.input_has_agent_dim and self.input_leaf_spec.shape[-2] != self.n_agents:
             raise ValueError(
                 "If the MLP input has the agent dimension,"
@@ -88,12 +161,48 @@ class Mlp(Model):
                 " the second to last spec dimension should be the number of agents"
             )
 
+    def _print_shared_trunk_savings(self):
+        in_features, num_cells = self.mlp.in_features, self.mlp.num_cells
+        trunk = _linear_layer_sizes(in_features, num_cells[:-1], num_cells[-1])
+        head = [(num_cells[-1], self.output_features)]
+        separate = _linear_layer_sizes(in_features, num_cells, self.output_features)
+
+        params = _n_params(trunk) + self.n_agents * _n_params(head)
+        flops = _n_flops(trunk) + self.n_agents * _n_flops(head)
+        separate_params = self.n_agents * _n_params(separate)
+        separate_flops = self.n_agents * _n_flops(separate)
+        print(
+            f"Shared trunk Mlp for group {self.agent_group}: "
+            f"{params} parameters and {flops} FLOPs per input "
+            f"({separate_params / params:.1f}x and {separate_flops / flops:.1f}x less than "
+            f"the {separate_params} parameters and {separate_flops} FLOPs of one network per agent)"
+        )
+
     def _forward(self, tensordict: TensorDictBase) -> TensorDictBase:
         # Gather in_key
         input = tensordict.get(self.in_key)
 
+        if self.chunk_agents:
+            res = agent_chunks_forward(
+                self._agents_forward,
+                self._agent_mlps,
+                self.n_agents,
+                self.agent_chunk_size,
+                self.checkpoint_agent_chunks,
+                input,
+            )
+
+        elif self.shared_trunk:
+            if self.input_has_agent_dim:
+                # The trunk reads the input of all agents
+                input = input.flatten(-2, -1)
+            res = self.mlp(input)
+
+        elif self.agent_embedding:
+            res = self._agents_forward(input, 0, self.n_agents)
+
         # Has multi-agent input dimension
-        if self.input_has_agent_dim:
+        elif self.input_has_agent_dim:
             res = self.mlp.forward(input)
             if not self.output_has_agent_dim:
                 # If we are here the module is centralised and parameter shared.
@@ -103,7 +212,9 @@ class Mlp(Model):
 
         # Does not have multi-agent input dimension
         else:
-            if not self.share_params:
+            if isinstance(self.mlp, _StackedMLP):
+                res = self.mlp(input)
+            elif not self.share_params:
                 res = torch.stack(
                     [net(input) for net in self.mlp],
                     dim=-2,
@@ -113,3 +224,256 @@ class Mlp(Model):
 
         tensordict.set(self.out_key, res)
         return tensordict
+
+    def _agent_mlps(self, start: int, end: int) -> nn.Module:
+        # The networks of the agents in [start, end)
+        if isinstance(self.mlp, (_StackedMLP, _AgentEmbeddingMLP)):
+            return self.mlp
+        nets = self.mlp.agent_networks if self.input_has_agent_dim else self.mlp
+        return nets if self.share_params else nets[start:end]
+
+    def _agents_forward(
+        self, input: torch.Tensor, start: int, end: int
+    ) -> torch.Tensor:
+        # The output of the agents in [start, end), for models whose output has the agent dimension
+        if isinstance(self.mlp, _StackedMLP):
+            return self.mlp(input, agents=slice(start, end))
+        if self.agent_embedding:
+            if self.centralised and self.input_has_agent_dim:
+                # Each agent reads the input of all agents
+                input = input.flatten(-2, -1)
+            return self.mlp(input, agents=slice(start, end))
+        if not self.input_has_agent_dim:
+            return torch.stack([self.mlp[i](input) for i in range(start, end)], dim=-2)
+
+        nets = self.mlp.agent_networks
+        if self.share_params:
+            return nets[0](input[..., start:end, :])
+        if self.centralised:
+            input = input.flatten(-2, -1)
+            return torch.stack([nets[i](input) for i in range(start, end)], dim=-2)
+        return torch.stack(
+            [nets[i](input[..., i, :]) for i in range(start, end)], dim=-2
+        )
+
+
+class _StackedMLP(nn.Module):
+    """Agent :class:`~torchrl.modules.MLP` networks with their parameters stacked along a leading agent dimension.
+
+    All the networks are evaluated on the same input (without the agent dimension): the first linear layer
+    is one matrix multiplication for all agents and the following ones are batched matrix multiplications,
+    so the cost does not grow with the number of python calls per agent.
+    The layers without parameters (e.g., activations) are shared as they act independently on each agent.
+
+    Args:
+        nets (list of MLP): the agent networks, which must satisfy :meth:`can_stack`
+    """
+
+    def __init__(self, nets: List[MLP]):
+        super().__init__()
+        self.n_nets = len(nets)
+        layers = []
+        for i, layer in enumerate(nets[0]):
+            if type(layer) is nn.Linear:
+                layer = _StackedLinear([net[i] for net in nets])
+            layers.append(layer)
+        self.layers = nn.ModuleList(layers)
+
+    @staticmethod
+    def can_stack(net: MLP) -> bool:
+        """Whether the layers of an MLP are either linear layers or have no parameters."""
+        return type(net[0]) is nn.Linear and all(
+            type(layer) is nn.Linear or not len(list(layer.parameters()))
+            for layer in net
+        )
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # Stack the parameters of checkpoints saved with one network per agent
+        for i, layer in enumerate(self.layers):
+            if not isinstance(layer, _StackedLinear):
+                continue
+            for name in ("weight", "bias"):
+                keys = [f"{prefix}{agent}.{i}.{name}" for agent in range(self.n_nets)]
+                if all(key in state_dict for key in keys):
+                    state_dict[f"{prefix}layers.{i}.{name}"] = torch.stack(
+                        [state_dict.pop(key) for key in keys]
+                    )
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
+    def forward(self, input: torch.Tensor, agents: slice = slice(None)) -> torch.Tensor:
+        batch_shape = input.shape[:-1]
+        res = input.reshape(-1, input.shape[-1])
+        for layer in self.layers:
+            res = (
+                layer(res, agents) if isinstance(layer, _StackedLinear) else layer(res)
+            )
+        # From (n_nets, batch, features) to (*batch, n_nets, features)
+        return res.transpose(0, 1).reshape(*batch_shape, res.shape[0], -1)
+
+
+class _StackedLinear(nn.Module):
+    def __init__(self, layers: List[nn.Linear]):
+        super().__init__()
+        self.weight = nn.Parameter(torch.stack([layer.weight.data for layer in layers]))
+        self.bias = (
+            nn.Parameter(torch.stack([layer.bias.data for layer in layers]))
+            if layers[0].bias is not None
+            else None
+        )
+
+    def forward(self, input: torch.Tensor, agents: slice = slice(None)) -> torch.Tensor:
+        # Only the layers of the agents in the slice are evaluated
+        weight = self.weight[agents]
+        bias = self.bias[agents] if self.bias is not None else None
+        if input.dim() == 2:
+            # The input is shared by all the layers: (batch, in) -> (n_nets, batch, out)
+            res = nn.functional.linear(
+                input,
+                weight.flatten(0, 1),
+                bias.flatten() if bias is not None else None,
+            )
+            return res.unflatten(-1, weight.shape[:2]).transpose(0, 1)
+        if bias is None:
+            return torch.bmm(input, weight.transpose(-1, -2))
+        return torch.baddbmm(bias.unsqueeze(-2), input, weight.transpose(-1, -2))
+
+
+class _SharedTrunkMLP(nn.Module):
+    """An :class:`~torchrl.modules.MLP` trunk shared by all agents followed by a linear output head per agent.
+
+    The trunk has the hidden layers in ``num_cells`` (the last one is activated) and the heads map
+    the trunk output to the output of each agent, with one matrix multiplication for all heads.
+
+    Args:
+        in_features (int): the number of input features
+        out_features (int): the number of output features of each agent
+        n_agents (int): the number of agents (and heads)
+        num_cells (int or Sequence[int]): the number of cells of the trunk layers, there must be at least one
+        device: the device of the parameters
+        **kwargs: the other kwargs of the trunk :class:`~torchrl.modules.MLP`
+    """
+
+    def __init__(
+        self,
+        in_features: int,
+        out_features: int,
+        n_agents: int,
+        num_cells: Union[int, Sequence[int]],
+        device,
+        **kwargs,
+    ):
+        super().__init__()
+        num_cells = [num_cells] if isinstance(num_cells, int) else list(num_cells)
+        if not len(num_cells):
+            raise ValueError("A shared trunk Mlp needs at least one layer in num_cells")
+        self.in_features = in_features
+        self.num_cells = num_cells
+        self.n_agents = n_agents
+        self.trunk = MLP(
+            in_features=in_features,
+            out_features=num_cells[-1],
+            num_cells=num_cells[:-1],
+            activate_last_layer=True,
+            device=device,
+            **kwargs,
+        )
+        self.heads = _StackedLinear(
+            [
+                nn.Linear(num_cells[-1], out_features, device=device)
+                for _ in range(n_agents)
+            ]
+        )
+
+    def forward(self, input: torch.Tensor) -> torch.Tensor:
+        batch_shape = input.shape[:-1]
+        res = self.trunk(input.reshape(-1, input.shape[-1]))
+        # From (n_agents, batch, features) to (*batch, n_agents, features)
+        res = self.heads(res).transpose(0, 1)
+        return res.reshape(*batch_shape, self.n_agents, -1)
+
+
+class _AgentEmbeddingMLP(nn.Module):
+    """An :class:`~torchrl.modules.MLP` shared by all agents, with its input extended by a learned embedding of each agent.
+
+    The agents share all the parameters but their embeddings, so they can behave differently at about the cost
+    of parameter sharing. When the first layer is linear, the embeddings are not concatenated to the input:
+    their contribution to the first layer is computed once per agent and added to the one of the input.
+
+    Args:
+        in_features (int): the number of input features
+        out_features (int): the number of output features of each agent
+        n_agents (int): the number of agents (and embeddings)
+        embedding_dim (int): the size of the agent embeddings
+        shared_input (bool): whether all agents read the same input, without the agent dimension
+        device: the device of the parameters
+        **kwargs: the other kwargs of the :class:`~torchrl.modules.MLP`
+    """
+
+    def __init__(
+        self,
+        in_features: int,
+        out_features: int,
+        n_agents: int,
+        embedding_dim: int,
+        shared_input: bool,
+        device,
+        **kwargs,
+    ):
+        super().__init__()
+        self.in_features = in_features
+        self.shared_input = shared_input
+        self.embedding = nn.Embedding(n_agents, embedding_dim, device=device)
+        self.mlp = MLP(
+            in_features=in_features + embedding_dim,
+            out_features=out_features,
+            device=device,
+            **kwargs,
+        )
+
+    def forward(self, input: torch.Tensor, agents: slice = slice(None)) -> torch.Tensor:
+        embedding = self.embedding.weight[agents]
+        if not self.shared_input:
+            input = input[..., agents, :]
+        layers = list(self.mlp)
+
+        if type(layers[0]) is nn.Linear:
+            weight = layers.pop(0).weight
+            res = nn.functional.linear(
+                input, weight[:, : self.in_features], self.mlp[0].bias
+            )
+            if self.shared_input:
+                res = res.unsqueeze(-2)
+            res = res + nn.functional.linear(embedding, weight[:, self.in_features :])
+        else:
+            if self.shared_input:
+                input = input.unsqueeze(-2).expand(
+                    *input.shape[:-1], len(embedding), input.shape[-1]
+                )
+            res = torch.cat(
+                [input, embedding.expand(*input.shape[:-1], embedding.shape[-1])],
+                dim=-1,
+            )
+
+        for layer in layers:
+            res = layer(res)
+        return res
+
+
+def _linear_layer_sizes(
+    in_features: int, num_cells: List[int], out_features: int
+) -> List[Tuple[int, int]]:
+    # The (in_features, out_features) of the linear layers of an MLP
+    sizes = [in_features] + num_cells + [out_features]
+    return list(zip(sizes[:-1], sizes[1:]))
+
+
+def _n_params(layers: List[Tuple[int, int]]) -> int:
+    return sum(
+        in_features * out_features + out_features
+        for in_features, out_features in layers
+    )
+
+
+def _n_flops(layers: List[Tuple[int, int]]) -> int:
+    # One multiplication and one addition per weight
+    return sum(2 * in_features * out_features for in_features, out_features in layers)
@@ -0,0 +1,261 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+"""Batched graphs built from node positions.
+
+The sparse graphs are built with a uniform grid spatial hash: nodes are sorted by the key of their grid cell
+and the neighbours of a node are looked for only in its cell and in the adjacent ones, so that, with a bounded
+number of nodes per cell, building the graphs is linear in the number of nodes.
+All the graphs of a batch are built together with vectorized tensor operations.
+Inside :func:`torch.vmap` the shapes of the tensors cannot depend on the data, so the k nearest neighbours graphs
+(which have a fixed number of edges) are built from the dense distances and the radius graphs are built
+with :func:`padded_radius_graph`.
+
+Edges go from the source node (``edge_index[0]``) to the target node (``edge_index[1]``),
+nodes are indexed in the flattened batch of graphs (node ``i`` of graph ``b`` has index ``b * n_nodes + i``).
+"""
+
+from __future__ import annotations
+
+from typing import Tuple
+
+import torch
+from torch import Tensor
+from torch._C._functorch import is_batchedtensor
+
+
+def radius_graph(pos: Tensor, radius: float, self_loops: bool) -> Tuple[Tensor, Tensor]:
+    """
+    Connects the nodes of each graph that are within ``radius`` of each other.
+
+    Args:
+        pos (Tensor): the node positions, of shape ``(n_graphs, n_nodes, n_dims)``
+        radius (float): the maximum distance of connected nodes
+        self_loops (bool): whether each node is connected to itself
+
+    Returns: the edge index of shape ``(2, n_edges)`` and the edge lengths of shape ``(n_edges,)``
+    """
+    if is_batchedtensor(pos):
+        raise ValueError(
+            "Radius graphs have a number of edges that depends on the positions and cannot be built inside "
+            "torch.vmap, use padded_radius_graph instead"
+        )
+    flat_pos = pos.reshape(-1, pos.shape[-1])
+    cell_size = torch.full((pos.shape[0],), radius, device=pos.device)
+    source, target = _grid_candidates(pos, cell_size)
+    distance = (flat_pos[source] - flat_pos[target]).norm(dim=-1)
+    keep = (distance <= radius) & (source != target)
+    edge_index = torch.stack([source[keep], target[keep]])
+    distance = distance[keep]
+    if self_loops:
+        edge_index, distance = _add_self_loops(edge_index, distance, len(flat_pos))
+    return edge_index, distance
+
+
+def padded_radius_graph(
+    pos: Tensor, radius: float, self_loops: bool
+) -> Tuple[Tensor, Tensor]:
+    """
+    The graph of :func:`radius_graph` with a number of edges that does not depend on the positions,
+    so that it can be built inside :func:`torch.vmap`.
+
+    All the pairs of nodes of each graph are edges, the pairs farther than ``radius`` have as target
+    an extra node of index ``n_graphs * n_nodes``. The extra node must be appended to the node features
+    and its output discarded, so that these edges do not change the output of the other nodes.
+
+    Args:
+        pos (Tensor): the node positions, of shape ``(n_graphs, n_nodes, n_dims)``
+        radius (float): the maximum distance of connected nodes
+        self_loops (bool): whether each node is connected to itself
+
+    Returns: the edge index of shape ``(2, n_graphs * n_nodes * (n_nodes - 1))`` (plus the self loops)
+        and the edge lengths of the same number of edges
+    """
+    n_graphs, n_nodes, n_dims = pos.shape
+    n_flat_nodes = n_graphs * n_nodes
+    target, source = (
+        (~torch.eye(n_nodes, dtype=torch.bool, device=pos.device)).nonzero().unbind(-1)
+    )
+    distance = (pos[:, source] - pos[:, target]).norm(dim=-1)
+    offset = (torch.arange(n_graphs, device=pos.device) * n_nodes).unsqueeze(-1)
+    source, target = source + offset, target + offset
+    target = torch.where(distance <= radius, target, n_flat_nodes)
+    edge_index = torch.stack([source.reshape(-1), target.reshape(-1)])
+    distance = distance.reshape(-1)
+    if self_loops:
+        edge_index, distance = _add_self_loops(edge_index, distance, n_flat_nodes)
+    return edge_index, distance
+
+
+def knn_graph(pos: Tensor, k: int, self_loops: bool) -> Tuple[Tensor, Tensor]:
+    """
+    Connects each node to its ``k`` nearest nodes in the same graph (all the other nodes if there are less than ``k``),
+    which send messages to it.
+
+    The grid cells are sized so that a cell contains about ``k`` nodes on average.
+    The neighbours found in the adjacent cells are exact if the ``k``-th nearest one is closer than the cell size,
+    the few nodes for which this does not hold look for their neighbours among all the nodes in their graph.
+
+    Args:
+        pos (Tensor): the node positions, of shape ``(n_graphs, n_nodes, n_dims)``
+        k (int): the number of neighbours of each node
+        self_loops (bool): whether each node is also connected to itself
+
+    Returns: the edge index of shape ``(2, n_edges)`` and the edge lengths of shape ``(n_edges,)``
+    """
+    n_graphs, n_nodes, n_dims = pos.shape
+    flat_pos = pos.reshape(-1, n_dims)
+    k = min(k, n_nodes - 1)
+    if is_batchedtensor(pos):
+        edge_index, distance = _dense_knn(
+            pos, torch.arange(len(flat_pos), device=pos.device), k
+        )
+        if self_loops:
+            edge_index, distance = _add_self_loops(edge_index, distance, len(flat_pos))
+        return edge_index, distance
+
+    span = (pos.amax(1) - pos.amin(1)).clamp(min=torch.finfo(pos.dtype).eps)
+    cell_size = (span.prod(-1) * (k + 1) / n_nodes) ** (1 / n_dims)
+    source, target = _grid_candidates(pos, cell_size)
+    distance = (flat_pos[source] - flat_pos[target]).norm(dim=-1)
+    # Never select the node itself
+    distance = distance.masked_fill(source == target, float("inf"))
+
+    # Rank of the candidates of each target by distance, sorting them by target and then by distance
+    # with a single key (the fraction part is below 1 and the node itself is last)
+    max_distance = distance.masked_fill(source == target, 0).max().double()
+    key = target.double() + (distance.double() / (2 * max_distance + 1)).clamp(max=0.75)
+    order = torch.argsort(key)
+    source, target, distance = source[order], target[order], distance[order]
+    n_candidates = torch.bincount(target, minlength=len(flat_pos))
+    first = torch.cumsum(n_candidates, 0) - n_candidates
+    rank = torch.arange(len(target), device=pos.device) - first[target]
+
+    # Targets with k candidates within the cell size, which covers all their closest nodes
+    kth = first + k - 1
+    exact = (n_candidates > k) & (
+        distance[kth.clamp(max=len(distance) - 1)]
+        <= cell_size.repeat_interleave(n_nodes)
+    )
+    if k == 0:
+        exact = torch.ones_like(exact)
+    keep = (rank < k) & exact[target]
+    edge_index = torch.stack([source[keep], target[keep]])
+    distance = distance[keep]
+
+    fallback = (~exact).nonzero().squeeze(-1)
+    if len(fallback):
+        edge_index, distance = _cat_edges(
+            (edge_index, distance), _dense_knn(pos, fallback, k)
+        )
+    if self_loops:
+        edge_index, distance = _add_self_loops(edge_index, distance, len(flat_pos))
+    return edge_index, distance
+
+
+def dense_radius_adjacency(pos: Tensor, radius: float, self_loops: bool) -> Tensor:
+    """
+    The adjacency tensor of :func:`radius_graph` of shape ``(n_graphs, n_nodes, n_nodes)``,
+    where ``adjacency[b, i, j]`` is 1 if node ``i`` receives messages from node ``j`` in graph ``b``.
+    """
+    adjacency = (torch.cdist(pos, pos) <= radius).to(pos.dtype)
+    return _set_self_loops(adjacency, self_loops)
+
+
+def dense_knn_adjacency(pos: Tensor, k: int, self_loops: bool) -> Tensor:
+    """
+    The adjacency tensor of :func:`knn_graph` of shape ``(n_graphs, n_nodes, n_nodes)``,
+    where ``adjacency[b, i, j]`` is 1 if node ``i`` receives messages from node ``j`` in graph ``b``.
+    """
+    n_nodes = pos.shape[-2]
+    k = min(k, n_nodes - 1)
+    distance = torch.cdist(pos, pos)
+    distance.diagonal(dim1=-2, dim2=-1).fill_(float("inf"))
+    adjacency = torch.zeros_like(distance)
+    adjacency.scatter_(-1, distance.topk(k, dim=-1, largest=False).indices, 1)
+    return _set_self_loops(adjacency, self_loops)
+
+
+def _grid_candidates(pos: Tensor, cell_size: Tensor) -> Tuple[Tensor, Tensor]:
+    """
+    All the pairs of nodes of the same graph in the same or in adjacent grid cells (including each node with itself),
+    with one cell size per graph.
+    Returns the source and target indices of the pairs in the flattened batch of nodes.
+    """
+    n_graphs, n_nodes, n_dims = pos.shape
+    cells = torch.floor(pos / cell_size.view(-1, 1, 1)).long()
+    # Shift the cells so that they and their neighbours have non-negative coordinates
+    cells = (cells - cells.amin(1, keepdim=True) + 1).view(-1, n_dims)
+    extent = cells.amax(0) + 2
+    graph = torch.arange(n_graphs, device=pos.device).repeat_interleave(n_nodes)
+
+    def cell_key(graph: Tensor, cells: Tensor) -> Tensor:
+        key = graph
+        for dim in range(n_dims):
+            key = key * extent[dim] + cells[..., dim]
+        return key
+
+    sorted_keys, order = torch.sort(cell_key(graph, cells))
+
+    offsets = torch.cartesian_prod(
+        *[torch.tensor([-1, 0, 1], device=pos.device)] * n_dims
+    ).view(-1, n_dims)
+    neighbour_keys = cell_key(graph.unsqueeze(-1), cells.unsqueeze(-2) + offsets).view(
+        -1
+    )
+    start = torch.searchsorted(sorted_keys, neighbour_keys)
+    n_candidates = torch.searchsorted(sorted_keys, neighbour_keys, right=True) - start
+
+    # The candidates of each target are contiguous, as its neighbour cells are
+    target = torch.arange(len(cells), device=pos.device).repeat_interleave(
+        n_candidates.view(len(cells), -1).sum(-1)
+    )
+    first = torch.cumsum(n_candidates, 0) - n_candidates
+    within = torch.arange(n_candidates.sum(), device=pos.device) - (
+        first.repeat_interleave(n_candidates)
+    )
+    source = order[start.repeat_interleave(n_candidates) + within]
+    return source, target
+
+
+def _dense_knn(pos: Tensor, nodes: Tensor, k: int) -> Tuple[Tensor, Tensor]:
+    # The k nearest neighbours of some nodes among all the nodes of their graph
+    n_nodes = pos.shape[-2]
+    graph = nodes // n_nodes
+    distance = (pos[graph] - pos.reshape(-1, pos.shape[-1])[nodes].unsqueeze(-2)).norm(
+        dim=-1
+    )
+    # Never select the node itself
+    distance = distance.masked_fill(
+        torch.arange(n_nodes, device=pos.device) == (nodes % n_nodes).unsqueeze(-1),
+        float("inf"),
+    )
+    distance, neighbours = distance.topk(k, dim=-1, largest=False)
+    source = (neighbours + (graph * n_nodes).unsqueeze(-1)).view(-1)
+    target = nodes.repeat_interleave(k)
+    return torch.stack([source, target]), distance.view(-1)
+
+
+def _add_self_loops(
+    edge_index: Tensor, distance: Tensor, n_nodes: int
+) -> Tuple[Tensor, Tensor]:
+    nodes = torch.arange(n_nodes, device=edge_index.device)
+    return _cat_edges(
+        (edge_index, distance),
+        (torch.stack([nodes, nodes]), distance.new_zeros(n_nodes)),
+    )
+
+
+def _cat_edges(*edges: Tuple[Tensor, Tensor]) -> Tuple[Tensor, Tensor]:
+    return (
+        torch.cat([edge_index for edge_index, _ in edges], dim=-1),
+        torch.cat([distance for _, distance in edges]),
+    )
+
+
+def _set_self_loops(adjacency: Tensor, self_loops: bool) -> Tensor:
+    adjacency.diagonal(dim1=-2, dim2=-1).fill_(1 if self_loops else 0)
+    return adjacency
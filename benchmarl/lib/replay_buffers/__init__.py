@@ -0,0 +1,28 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+from .codecs import AffineUInt8Codec, BitPackCodec, CastCodec, Codec
+from .minibatch_samplers import BulkMinibatchSampler, MinibatchPrefetcher
+from .on_policy import OnPolicyMinibatchIterator
+from .replay_buffers import PrioritizedReplayBuffer
+from .samplers import SumTreeSampler, TieredSampler
+from .storages import CodecStorage, NextDedupStorage, TieredStorage
+
+__all__ = [
+    AffineUInt8Codec,
+    BitPackCodec,
+    BulkMinibatchSampler,
+    CastCodec,
+    Codec,
+    CodecStorage,
+    MinibatchPrefetcher,
+    NextDedupStorage,
+    OnPolicyMinibatchIterator,
+    PrioritizedReplayBuffer,
+    SumTreeSampler,
+    TieredSampler,
+    TieredStorage,
+]
@@ -0,0 +1,133 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+from abc import ABC, abstractmethod
+from typing import Optional, Union
+
+import torch
+
+from torchrl.data import BoundedTensorSpec, TensorSpec
+
+
+class Codec(ABC):
+    """
+    Abstract class for a storage codec.
+
+    Codecs encode one entry of the data stored in a replay buffer and decode it when it is sampled.
+    Encoding and decoding act on tensors with one leading batch dimension (the storage dimension),
+    the trailing dimensions can be flattened or reshaped freely as the codec remembers them.
+    """
+
+    def __init__(self):
+        self._dtype = None
+        self._shape = None
+
+    def encode(self, tensor: torch.Tensor) -> torch.Tensor:
+        """Encodes a tensor of shape ``(batch, *shape)``."""
+        self._dtype = tensor.dtype
+        self._shape = tensor.shape[1:]
+        return self._encode(tensor)
+
+    def decode(self, tensor: torch.Tensor) -> torch.Tensor:
+        """Decodes a tensor of shape ``(batch, *encoded_shape)`` into the dtype and shape it was encoded from."""
+        return self._decode(tensor).reshape(tensor.shape[:1] + self._shape)
+
+    @abstractmethod
+    def _encode(self, tensor: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _decode(self, tensor: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+
+class CastCodec(Codec):
+    """Stores a floating point entry in a lower precision dtype (e.g., float16, bfloat16, or float32 for float64 entries).
+
+    Args:
+        dtype (torch.dtype): the dtype used for storage
+    """
+
+    def __init__(self, dtype: torch.dtype):
+        super().__init__()
+        self.dtype = dtype
+
+    def _encode(self, tensor: torch.Tensor) -> torch.Tensor:
+        return tensor.to(self.dtype)
+
+    def _decode(self, tensor: torch.Tensor) -> torch.Tensor:
+        return tensor.to(self._dtype)
+
+
+class AffineUInt8Codec(Codec):
+    """Quantizes a floating point entry with values in ``[low, high]`` to 256 levels stored as uint8.
+
+    Values outside of the bounds are clamped.
+
+    Args:
+        low (float or Tensor): lower bound of the entry, broadcastable to its trailing shape
+        high (float or Tensor): upper bound of the entry, broadcastable to its trailing shape
+    """
+
+    def __init__(
+        self, low: Union[float, torch.Tensor], high: Union[float, torch.Tensor]
+    ):
+        super().__init__()
+        self.low = torch.as_tensor(low, dtype=torch.float)
+        self.scale = (torch.as_tensor(high, dtype=torch.float) - self.low) / 255
+        if not torch.isfinite(self.scale).all() or (self.scale <= 0).any():
+            raise ValueError(
+                "AffineUInt8Codec needs finite bounds with high > low, "
+                f"got low={low} and high={high}"
+            )
+
+    @classmethod
+    def from_spec(cls, spec: TensorSpec) -> "AffineUInt8Codec":
+        """Creates the codec from the bounds of a :class:`~torchrl.data.BoundedTensorSpec`."""
+        if not isinstance(spec, BoundedTensorSpec):
+            raise ValueError(
+                f"uint8 quantization needs a bounded spec, got {type(spec).__name__}"
+            )
+        return cls(spec.space.low, spec.space.high)
+
+    def _encode(self, tensor: torch.Tensor) -> torch.Tensor:
+        low = self.low.to(tensor.device)
+        scale = self.scale.to(tensor.device)
+        return ((tensor - low) / scale).round_().clamp_(0, 255).to(torch.uint8)
+
+    def _decode(self, tensor: torch.Tensor) -> torch.Tensor:
+        low = self.low.to(tensor.device)
+        scale = self.scale.to(tensor.device)
+        return (tensor.to(torch.float) * scale + low).to(self._dtype)
+
+
+class BitPackCodec(Codec):
+    """Packs a boolean entry into bits, storing 8 values per uint8.
+
+    All the trailing dimensions of the entry (e.g., agents and flags) are packed together.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._shifts: Optional[torch.Tensor] = None
+
+    def _get_shifts(self, device: torch.device) -> torch.Tensor:
+        if self._shifts is None or self._shifts.device != device:
+            self._shifts = torch.arange(8, dtype=torch.uint8, device=device)
+        return self._shifts
+
+    def _encode(self, tensor: torch.Tensor) -> torch.Tensor:
+        flat = tensor.reshape(tensor.shape[0], -1).to(torch.uint8)
+        padding = -flat.shape[1] % 8
+        if padding:
+            flat = torch.nn.functional.pad(flat, (0, padding))
+        bits = flat.reshape(flat.shape[0], -1, 8) << self._get_shifts(tensor.device)
+        return bits.sum(-1, dtype=torch.uint8)
+
+    def _decode(self, tensor: torch.Tensor) -> torch.Tensor:
+        bits = (tensor.unsqueeze(-1) >> self._get_shifts(tensor.device)) & 1
+        n_values = self._shape.numel()
+        return bits.reshape(tensor.shape[0], -1)[:, :n_values].to(torch.bool)
@@ -0,0 +1,161 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional
+
+import torch
+
+from tensordict import TensorDictBase
+from tensordict.utils import expand_as_right
+from torchrl.data import ReplayBuffer
+
+
+def _gather_minibatch(
+    buffer: ReplayBuffer, index: torch.Tensor, info: Dict[str, Any]
+) -> TensorDictBase:
+    """Reads the data at ``index`` from the storage of a replay buffer, as its ``sample`` method does."""
+    with buffer._replay_lock:
+        data = buffer._storage.get(index)
+    data = buffer._collate_fn(data)
+    if buffer._transform is not None and len(buffer._transform):
+        data = buffer._transform(data)
+    # Mirror TensorDictReplayBuffer.sample, which writes the sampling info in the data
+    info["index"] = index
+    for key, value in info.items():
+        value = torch.as_tensor(value, device=data.device)
+        if value.shape[: data.batch_dims] != data.batch_size:
+            value = expand_as_right(value, data)
+        data.set(key, value)
+    return data
+
+
+class MinibatchPrefetcher:
+    """Prefetches the minibatches sampled from a replay buffer on a background thread.
+
+    The indices of each minibatch are sampled on the calling thread, so that all the random numbers are
+    drawn from the same thread in a deterministic order.
+    The data is gathered from the storage (and decoded) on a background thread, while the calling thread trains
+    on the previous minibatches.
+
+    With a prioritized sampler, the indices of a minibatch are sampled ``n_prefetch`` minibatches in advance,
+    so the priority updates of the last ``n_prefetch`` training steps are not taken into account when sampling it.
+
+    Args:
+        replay_buffer (ReplayBuffer): the replay buffer to sample from. It must not be extended
+            while minibatches are being prefetched
+        n_prefetch (int): the number of minibatches gathered while the current one is used
+    """
+
+    def __init__(self, replay_buffer: ReplayBuffer, n_prefetch: int):
+        if n_prefetch < 1:
+            raise ValueError(f"n_prefetch ({n_prefetch}) must be at least 1")
+        self.replay_buffer = replay_buffer
+        self.n_prefetch = n_prefetch
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending: Deque[Future] = deque()
+        self._n_to_sample = 0
+
+    def start(self, n_minibatches: int) -> None:
+        """Starts prefetching the next ``n_minibatches`` minibatches."""
+        self._drain()
+        self._n_to_sample = n_minibatches
+        for _ in range(min(self.n_prefetch, n_minibatches)):
+            self._submit()
+
+    def sample(self) -> TensorDictBase:
+        """Returns the next minibatch and starts gathering a new one, if any is left."""
+        if not len(self._pending):
+            raise RuntimeError(
+                "All the minibatches have been sampled, call start() to prefetch new ones"
+            )
+        future = self._pending.popleft()
+        if self._n_to_sample > 0:
+            self._submit()
+        return future.result()
+
+    def close(self) -> None:
+        """Waits for the pending minibatches and stops the background thread."""
+        self._drain()
+        self._executor.shutdown()
+
+    def _drain(self):
+        while len(self._pending):
+            self._pending.popleft().result()
+        self._n_to_sample = 0
+
+    def _submit(self):
+        buffer = self.replay_buffer
+        index, info = buffer._sampler.sample(buffer._storage, buffer._batch_size)
+        self._pending.append(
+            self._executor.submit(_gather_minibatch, buffer, index, info)
+        )
+        self._n_to_sample -= 1
+
+
+class BulkMinibatchSampler:
+    """Samples the minibatches of many training steps at once.
+
+    The indices of up to ``block_size`` minibatches are drawn with one call to the sampler and gathered from the storage
+    into one contiguous block, which is then sliced into minibatches.
+    This saves the per-step overhead of sampling (index draw, gather and tensordict construction) when minibatches are small.
+
+    With a prioritized sampler, all the minibatches of a block are sampled with the priorities of the step
+    at which the block is drawn, and the indices are shuffled across the minibatches of the block
+    (stratified samplers draw consecutive indices from consecutive segments of the priority mass).
+
+    Args:
+        replay_buffer (ReplayBuffer): the replay buffer to sample from. It must not be extended
+            while its minibatches are being sampled
+        block_size (int): the maximum number of minibatches gathered at once
+    """
+
+    def __init__(self, replay_buffer: ReplayBuffer, block_size: int):
+        if block_size < 1:
+            raise ValueError(f"block_size ({block_size}) must be at least 1")
+        self.replay_buffer = replay_buffer
+        self.block_size = block_size
+        self._block: Optional[TensorDictBase] = None
+        self._position = 0
+        self._n_to_sample = 0
+
+    def start(self, n_minibatches: int) -> None:
+        """Starts sampling the next ``n_minibatches`` minibatches."""
+        self._block = None
+        self._position = 0
+        self._n_to_sample = n_minibatches
+
+    def sample(self) -> TensorDictBase:
+        """Returns the next minibatch, sampling a new block if the current one is used up."""
+        if self._block is None or self._position == len(self._block):
+            if self._n_to_sample == 0:
+                raise RuntimeError(
+                    "All the minibatches have been sampled, call start() to sample new ones"
+                )
+            n_minibatches = min(self.block_size, self._n_to_sample)
+            self._block = self._sample_block(n_minibatches)
+            self._position = 0
+            self._n_to_sample -= n_minibatches
+        minibatch = self._block[self._position]
+        self._position += 1
+        return minibatch
+
+    def close(self) -> None:
+        """Releases the current block."""
+        self._block = None
+
+    def _sample_block(self, n_minibatches: int) -> TensorDictBase:
+        buffer = self.replay_buffer
+        batch_size = buffer._batch_size
+        index, info = buffer._sampler.sample(
+            buffer._storage, n_minibatches * batch_size
+        )
+        permutation = torch.randperm(n_minibatches * batch_size, device=index.device)
+        index = index[permutation]
+        info = {key: value[permutation] for key, value in info.items()}
+        block = _gather_minibatch(buffer, index, info)
+        return block.reshape(n_minibatches, batch_size)
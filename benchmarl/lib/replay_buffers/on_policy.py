@@ -0,0 +1,78 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+from typing import Any, Dict, Optional
+
+import torch
+
+from benchmarl.lib.utils import DEVICE_TYPING
+from tensordict import TensorDictBase
+
+
+class OnPolicyMinibatchIterator:
+    """Minibatch iterator over the batch collected in one on-policy iteration.
+
+    It replaces a replay buffer for on-policy algorithms, exposing the part of the
+    :class:`~torchrl.data.ReplayBuffer` API used by experiments.
+    The extended batch is kept as it is, without being copied into a storage.
+    At the start of each epoch a permutation of the batch is generated on device and the batch is shuffled
+    in one gather, minibatches are then contiguous slices of the shuffled batch.
+    Each epoch yields ``len(batch) // batch_size`` minibatches, the last incomplete one is dropped.
+
+    Args:
+        batch_size (int): the size of minibatches
+        device (DEVICE_TYPING): the device where the batch is kept
+    """
+
+    def __init__(self, batch_size: int, device: DEVICE_TYPING):
+        self._batch_size = batch_size
+        self.device = device
+        self.empty()
+
+    def __len__(self) -> int:
+        return 0 if self._data is None else self._data.shape[0]
+
+    def empty(self):
+        self._data = None
+        self._epoch_data = None
+        self._cursor = 0
+
+    def extend(self, data: TensorDictBase) -> torch.Tensor:
+        """Replaces the batch with a new one, which has to have one batch dimension."""
+        self._data = data.to(self.device)
+        self._epoch_data = None
+        self._cursor = 0
+        return torch.arange(len(self), device=self.device)
+
+    def _new_epoch(self):
+        permutation = torch.randperm(len(self), device=self.device)
+        self._epoch_data = self._data[permutation]
+        self._cursor = 0
+
+    def sample(self, batch_size: Optional[int] = None) -> TensorDictBase:
+        """Returns the next minibatch of the current epoch, starting a new epoch when it is exhausted."""
+        batch_size = batch_size if batch_size is not None else self._batch_size
+        if not len(self):
+            raise RuntimeError("Cannot sample from an empty iterator.")
+        if batch_size > len(self):
+            raise ValueError(
+                f"Minibatch size ({batch_size}) is larger than the batch ({len(self)})"
+            )
+        if self._epoch_data is None or self._cursor + batch_size > len(self):
+            self._new_epoch()
+        minibatch = self._epoch_data[self._cursor : self._cursor + batch_size]
+        self._cursor += batch_size
+        return minibatch
+
+    def update_tensordict_priority(self, data: TensorDictBase) -> None:
+        return
+
+    def state_dict(self) -> Dict[str, Any]:
+        # The batch is collected again at every iteration, there is nothing to restore
+        return {}
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        return
@@ -0,0 +1,25 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+from tensordict import TensorDictBase
+from torchrl.data import TensorDictReplayBuffer
+
+
+class PrioritizedReplayBuffer(TensorDictReplayBuffer):
+    """A :class:`~torchrl.data.TensorDictReplayBuffer` that updates the priorities of any prioritized sampler.
+
+    The priorities of a whole sampled batch are read from its ``priority_key``
+    and passed to the sampler in one vectorized call.
+    It is meant to be used with :class:`~benchmarl.lib.replay_buffers.SumTreeSampler`.
+    """
+
+    def update_tensordict_priority(self, data: TensorDictBase) -> None:
+        priority = self._get_priority_vector(data)
+        index = data.get("index")
+        while index.ndim > priority.ndim:
+            # reduce index
+            index = index[..., 0]
+        self.update_priority(index, priority)
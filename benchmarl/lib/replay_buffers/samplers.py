@@ -0,0 +1,184 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+import math
+from pathlib import Path
+from typing import Any, Dict, Tuple, Union
+
+import torch
+
+from benchmarl.lib.utils import DEVICE_TYPING
+from torchrl.data.replay_buffers import Sampler, Storage
+
+
+class SumTreeSampler(Sampler):
+    """Prioritized sampler backed by a batched, array-based sum-tree.
+
+    Presented in "Schaul, T.; Quan, J.; Antonoglou, I.; and Silver, D. 2015. Prioritized experience replay."
+    (https://arxiv.org/abs/1511.05952)
+
+    The sum tree is stored as a flat tensor on ``device`` (node ``i`` has children ``2i`` and ``2i+1``).
+    Priority updates and the stratified sampling of a whole batch are vectorized over the batch,
+    with one tensor operation per tree level, so they never loop over samples nor sync with the host.
+    No importance sampling weights are computed, as the losses do not consume them.
+
+    Args:
+        max_capacity (int): the maximum number of elements in the storage
+        alpha (float): how much prioritization is used (0 corresponds to uniform sampling)
+        eps (float, optional): value added to priorities so that no element has a zero probability.
+            Defaults to 1e-8
+        reduction (str, optional): how the priorities of the entries of one element (e.g., of the agents)
+            are reduced to one priority. One of "max", "min", "mean", "median". Defaults to "max"
+        device (DEVICE_TYPING, optional): the device of the trees, it should be the one of the storage.
+            Defaults to "cpu"
+    """
+
+    def __init__(
+        self,
+        max_capacity: int,
+        alpha: float,
+        eps: float = 1e-8,
+        reduction: str = "max",
+        device: DEVICE_TYPING = "cpu",
+    ):
+        if alpha < 0:
+            raise ValueError(f"alpha ({alpha}) must be non-negative")
+        self._max_capacity = max_capacity
+        self._alpha = alpha
+        self._eps = eps
+        self.reduction = reduction
+        self.device = torch.device(device)
+        self._depth = max(1, math.ceil(math.log2(max_capacity)))
+        self._n_leaves = 2**self._depth
+        self._empty()
+
+    def _empty(self):
+        self._sum_tree = torch.zeros(2 * self._n_leaves, device=self.device)
+        self._max_priority = torch.ones((), device=self.device)
+
+    @property
+    def default_priority(self) -> float:
+        return self._max_priority.item()
+
+    def _set(self, index: torch.Tensor, value: torch.Tensor) -> None:
+        node = index + self._n_leaves
+        self._sum_tree[node] = value
+        for _ in range(self._depth):
+            # Parents shared by multiple indices are written multiple times with the same value
+            node = node // 2
+            self._sum_tree[node] = (
+                self._sum_tree[2 * node] + self._sum_tree[2 * node + 1]
+            )
+
+    def _as_index(self, index: Union[int, torch.Tensor]) -> torch.Tensor:
+        return torch.as_tensor(index, dtype=torch.long, device=self.device).reshape(-1)
+
+    def add(self, index: int) -> None:
+        self.extend(index)
+
+    def extend(self, index: torch.Tensor) -> None:
+        if index is None:
+            # some writers don't systematically write data and can return None
+            return
+        index = self._as_index(index)
+        # New elements get the highest priority seen so far, so that they are sampled at least once
+        priority = torch.pow(self._max_priority + self._eps, self._alpha)
+        self._set(index, priority.expand(index.shape))
+
+    @torch.no_grad()
+    def update_priority(
+        self, index: Union[int, torch.Tensor], priority: Union[float, torch.Tensor]
+    ) -> None:
+        index = self._as_index(index)
+        priority = torch.as_tensor(
+            priority, dtype=torch.float, device=self.device
+        ).detach()
+        if priority.numel() == 1:
+            priority = priority.reshape(()).expand(index.shape)
+        else:
+            priority = priority.reshape(index.shape)
+        self._max_priority = torch.maximum(self._max_priority, priority.max())
+        self._set(index, torch.pow(priority + self._eps, self._alpha))
+
+    @torch.no_grad()
+    def sample(self, storage: Storage, batch_size: int) -> Tuple[torch.Tensor, dict]:
+        if len(storage) == 0:
+            raise RuntimeError("Cannot sample from an empty storage.")
+        # Stratified sampling: one uniform sample in each of batch_size equal segments of the total mass
+        segment = self._sum_tree[1] / batch_size
+        mass = (
+            torch.arange(batch_size, device=self.device)
+            + torch.rand(batch_size, device=self.device)
+        ) * segment
+
+        node = torch.ones(batch_size, dtype=torch.long, device=self.device)
+        for _ in range(self._depth):
+            left = 2 * node
+            left_sum = self._sum_tree[left]
+            # Never descend into an empty subtree because of floating point errors
+            go_right = (mass >= left_sum) & (self._sum_tree[left + 1] > 0)
+            mass = torch.where(go_right, mass - left_sum, mass)
+            node = left + go_right
+        return node - self._n_leaves, {}
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {
+            "_sum_tree": self._sum_tree,
+            "_max_priority": self._max_priority,
+        }
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        self._sum_tree = state_dict["_sum_tree"].to(self.device)
+        self._max_priority = state_dict["_max_priority"].to(self.device)
+
+    def dumps(self, path):
+        path = Path(path).absolute()
+        path.mkdir(exist_ok=True)
+        torch.save(self.state_dict(), path / "sampler_metadata.pt")
+
+    def loads(self, path):
+        self.load_state_dict(torch.load(Path(path).absolute() / "sampler_metadata.pt"))
+
+
+class TieredSampler(Sampler):
+    """Samples a :class:`~benchmarl.lib.replay_buffers.TieredStorage`, biased toward the frames of its hot tier.
+
+    A fraction ``hot_fraction`` of each batch is sampled uniformly among the frames of the hot tier,
+    the rest uniformly among all the frames in the storage (hot frames included).
+
+    Args:
+        hot_fraction (float): the fraction of each batch sampled from the hot tier
+    """
+
+    def __init__(self, hot_fraction: float):
+        if not 0 <= hot_fraction <= 1:
+            raise ValueError(f"hot_fraction ({hot_fraction}) must be in [0, 1]")
+        self.hot_fraction = hot_fraction
+
+    def sample(self, storage: Storage, batch_size: int) -> Tuple[torch.Tensor, dict]:
+        if len(storage) == 0:
+            raise RuntimeError("Cannot sample from an empty storage.")
+        n_from_hot = round(batch_size * self.hot_fraction)
+        hot_index = storage.hot_index(torch.randint(storage.n_hot, (n_from_hot,)))
+        index = torch.randint(len(storage), (batch_size - n_from_hot,))
+        return torch.cat([hot_index, index]), {}
+
+    def _empty(self):
+        pass
+
+    def dumps(self, path):
+        path = Path(path).absolute()
+        path.mkdir(exist_ok=True)
+        torch.save(self.state_dict(), path / "sampler_metadata.pt")
+
+    def loads(self, path):
+        self.load_state_dict(torch.load(Path(path).absolute() / "sampler_metadata.pt"))
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {"hot_fraction": self.hot_fraction}
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        self.hot_fraction = state_dict["hot_fraction"]
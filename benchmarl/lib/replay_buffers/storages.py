@@ -0,0 +1,596 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+import json
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+import torch
+
+from benchmarl.lib.replay_buffers.codecs import BitPackCodec, CastCodec, Codec
+from benchmarl.lib.utils import DEVICE_TYPING
+from tensordict import TensorDict, TensorDictBase
+from tensordict.utils import NestedKey
+from torchrl.data import LazyMemmapStorage, LazyTensorStorage
+from torchrl.data.replay_buffers import TensorStorage
+
+_CODECS_KEY = "_codecs"
+
+
+def _as_tuple(key: NestedKey):
+    return key if isinstance(key, tuple) else (key,)
+
+
+def _bytes_per_element(data: TensorDictBase) -> int:
+    return sum(
+        tensor[0].numel() * tensor.element_size() for tensor in data.values(True, True)
+    )
+
+
+class CodecStorage(LazyTensorStorage):
+    """A :class:`~torchrl.data.LazyTensorStorage` that stores entries through codecs.
+
+    Entries are encoded when the storage is extended and decoded when it is sampled.
+    Encoded entries are stored under ``"_codecs"`` at the root of the data, so that codecs can
+    change the trailing shape of an entry (e.g., packing the flags of all agents together).
+
+    Args:
+        max_size (int): the maximum number of elements in the storage
+        codecs (dict, optional): a mapping from entry keys to the :class:`~benchmarl.lib.replay_buffers.codecs.Codec`
+            used to store them. Keys missing from the data are ignored.
+        pack_bools (bool, optional): whether to bit-pack all the boolean entries without a codec. Defaults to False
+        coerce_float64 (bool, optional): whether to store all the float64 entries without a codec as float32.
+            Defaults to True
+        device (DEVICE_TYPING, optional): the device of the storage. Defaults to "cpu"
+        shared_storage (CodecStorage, optional): a storage shared with the storages of other groups.
+            If provided, all the entries that are not specific to ``group`` (e.g., the global state, reward and done)
+            are stored there once for all groups and read back from it when sampling.
+            All the storages sharing it have to be extended with the same frames. The first storage to write a frame
+            writes its global entries, the others only keep a reference to its index.
+        group (str, optional): the group whose entries are stored in this storage. Required if ``shared_storage`` is provided.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        codecs: Optional[Dict[NestedKey, Codec]] = None,
+        pack_bools: bool = False,
+        coerce_float64: bool = True,
+        device: DEVICE_TYPING = "cpu",
+        shared_storage: Optional["CodecStorage"] = None,
+        group: Optional[str] = None,
+    ):
+        super().__init__(max_size, device=device)
+        if shared_storage is not None:
+            if group is None:
+                raise ValueError("A group is required to use a shared storage")
+            if shared_storage.max_size != max_size:
+                raise ValueError(
+                    f"The shared storage has size {shared_storage.max_size}, "
+                    f"while this storage has size {max_size}"
+                )
+        self.codecs = {
+            _as_tuple(key): codec
+            for key, codec in (codecs if codecs is not None else {}).items()
+        }
+        self.pack_bools = pack_bools
+        self.coerce_float64 = coerce_float64
+        self.shared_storage = shared_storage
+        self.group = group
+        self._codecs_resolved = False
+        self._shared_keys: Optional[List[NestedKey]] = None
+        self._n_frames_written = 0
+        self.compression_ratio: Optional[float] = None
+
+    def _resolve_codecs(self, data: TensorDictBase):
+        codecs = {}
+        for key, tensor in data.items(True, True):
+            key = _as_tuple(key)
+            if key in self.codecs:
+                codecs[key] = self.codecs[key]
+            elif self.pack_bools and tensor.dtype == torch.bool:
+                codecs[key] = BitPackCodec()
+            elif self.coerce_float64 and tensor.dtype == torch.float64:
+                codecs[key] = CastCodec(torch.float32)
+        self.codecs = codecs
+        self._codecs_resolved = True
+
+    def _encode(self, data: TensorDictBase) -> TensorDictBase:
+        if not self._codecs_resolved:
+            self._resolve_codecs(data)
+        encoded = data.exclude(*self.codecs.keys())
+        for key, codec in self.codecs.items():
+            encoded.set((_CODECS_KEY, *key), codec.encode(data.get(key)))
+        return encoded
+
+    def _decode(self, data: TensorDictBase) -> TensorDictBase:
+        if not len(self.codecs):
+            return data
+        encoded = data.get(_CODECS_KEY)
+        decoded = data.exclude(_CODECS_KEY)
+        for key, codec in self.codecs.items():
+            decoded.set(key, codec.decode(encoded.get(key)))
+        return decoded
+
+    def set(
+        self,
+        cursor: Union[int, Sequence[int], slice],
+        data: TensorDictBase,
+    ):
+        # Replay buffers wrap the data as {"_data": data, "index": index}
+        wrapped = "_data" in data.keys()
+        raw = data.get("_data") if wrapped else data
+        self._n_frames_written += raw.numel()
+        encoded = self._encode(self._set_shared(cursor, raw))
+        if self.compression_ratio is None:
+            self.compression_ratio = _bytes_per_element(raw) / _bytes_per_element(
+                encoded
+            )
+        if wrapped:
+            data = data.clone(False)
+            data.set("_data", encoded)
+        else:
+            data = encoded
+        return super().set(cursor, data)
+
+    def _set_shared(
+        self, cursor: Union[int, Sequence[int], slice], data: TensorDictBase
+    ) -> TensorDictBase:
+        """Writes the global entries of ``data`` to the shared storage (if not yet written) and returns the others."""
+        if self.shared_storage is None:
+            return data
+        if self._shared_keys is None:
+            self._shared_keys = [
+                key
+                for key in data.keys(True, True)
+                if _as_tuple(key)[0] != self.group
+                and _as_tuple(key)[:2] != ("next", self.group)
+            ]
+        if self._n_frames_written > self.shared_storage._n_frames_written:
+            self.shared_storage.set(cursor, data.select(*self._shared_keys))
+        return data.exclude(*self._shared_keys)
+
+    def get(self, index: Union[int, Sequence[int], slice]) -> Any:
+        data = super().get(index)
+        wrapped = "_data" in data.keys()
+        decoded = self._decode(data.get("_data") if wrapped else data)
+        if self.shared_storage is not None:
+            decoded.update(self.shared_storage.get(index))
+        if wrapped:
+            data = data.clone(False)
+            data.set("_data", decoded)
+            return data
+        return decoded
+
+    def state_dict(self) -> Dict[str, Any]:
+        state_dict = super().state_dict()
+        state_dict["_n_frames_written"] = self._n_frames_written
+        if self.shared_storage is not None:
+            # The tensors of the shared storage are the same in the state dict of each group,
+            # so they are saved only once when the state dicts are saved together
+            state_dict["_shared_storage"] = self.shared_storage.state_dict()
+        return state_dict
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        state_dict = dict(state_dict)
+        self._n_frames_written = state_dict.pop("_n_frames_written", 0)
+        shared_state_dict = state_dict.pop("_shared_storage", None)
+        if self.shared_storage is not None and shared_state_dict is not None:
+            self.shared_storage.load_state_dict(shared_state_dict)
+        super().load_state_dict(state_dict)
+
+    def _get_decoded(self, key: NestedKey, index: torch.Tensor) -> torch.Tensor:
+        """Reads and decodes one entry at ``index``, without reading the rest of the data."""
+        storage = self._storage
+        if "_data" in storage.keys():
+            storage = storage.get("_data")
+        key = _as_tuple(key)
+        if key in self.codecs:
+            return self.codecs[key].decode(storage.get((_CODECS_KEY, *key))[index])
+        return storage.get(key)[index]
+
+
+class NextDedupStorage(CodecStorage):
+    """A :class:`CodecStorage` that stores each observation once, instead of also storing it as the next observation of the previous frame.
+
+    Collected batches store the consecutive frames of each environment contiguously, so the next observation of a frame
+    is usually the observation of the frame written right after it.
+    When a batch is written, the next observation of each frame is compared to the observation of the following frame.
+    If they are equal, the next observation is not stored and it is read from the following slot at sample time.
+    Otherwise (e.g., for the last frame of each environment in the batch or when the episode is done and the environment reset),
+    the next observation is stored in an overflow buffer, which grows only when all its entries are still referenced.
+
+    Slots are overwritten in order, so a slot is always overwritten before (or together with) the slot following it
+    and the reconstructed next observations stay valid for as long as the frames are in the storage.
+
+    Args:
+        max_size (int): the maximum number of elements in the storage
+        dedup_keys (list of NestedKey): the keys of the observations to store once. Their next observations are
+            expected under ``("next", *key)``
+        codecs (dict, optional): a mapping from entry keys to the :class:`~benchmarl.lib.replay_buffers.codecs.Codec`
+            used to store them. The codec of a deduplicated key is also used for its next observations.
+        pack_bools (bool, optional): whether to bit-pack all the boolean entries without a codec. Defaults to False
+        coerce_float64 (bool, optional): whether to store all the float64 entries without a codec as float32.
+            Defaults to True
+        device (DEVICE_TYPING, optional): the device of the storage. Defaults to "cpu"
+        shared_storage (CodecStorage, optional): a storage shared with the storages of other groups,
+            see :class:`CodecStorage`. The deduplicated keys have to be entries of ``group``.
+        group (str, optional): the group whose entries are stored in this storage. Required if ``shared_storage`` is provided.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        dedup_keys: Sequence[NestedKey],
+        codecs: Optional[Dict[NestedKey, Codec]] = None,
+        pack_bools: bool = False,
+        coerce_float64: bool = True,
+        device: DEVICE_TYPING = "cpu",
+        shared_storage: Optional[CodecStorage] = None,
+        group: Optional[str] = None,
+    ):
+        super().__init__(
+            max_size,
+            codecs=codecs,
+            pack_bools=pack_bools,
+            coerce_float64=coerce_float64,
+            device=device,
+            shared_storage=shared_storage,
+            group=group,
+        )
+        self.dedup_keys = [_as_tuple(key) for key in dedup_keys]
+        # For each key and slot, the index of its next observation in the overflow buffer,
+        # or -1 if the next observation is the observation of the following slot
+        self._next_index: Dict[NestedKey, torch.Tensor] = {}
+        # For each key, the overflow buffer and the slot that owns each of its entries
+        self._overflow: Dict[NestedKey, torch.Tensor] = {}
+        self._overflow_slot: Dict[NestedKey, torch.Tensor] = {}
+        self._overflow_cursor: Dict[NestedKey, int] = {}
+        self._index: Optional[torch.Tensor] = None
+
+    def _as_index(self, index: Union[int, Sequence[int], slice]) -> torch.Tensor:
+        if isinstance(index, slice):
+            return torch.arange(self.max_size)[index]
+        return torch.as_tensor(index, dtype=torch.long)
+
+    def _encode(self, data: TensorDictBase) -> TensorDictBase:
+        encoded = super()._encode(
+            data.exclude(*[("next", *key) for key in self.dedup_keys])
+        )
+        index = self._index.reshape(-1)
+        n_dims = data.batch_dims
+        for key in self.dedup_keys:
+            observation = data.get(key)
+            next_observation = data.get(("next", *key))
+            self._dedup(
+                key,
+                index,
+                observation.reshape(-1, *observation.shape[n_dims:]),
+                next_observation.reshape(-1, *next_observation.shape[n_dims:]),
+            )
+        return encoded
+
+    def _dedup(
+        self,
+        key: NestedKey,
+        index: torch.Tensor,
+        observation: torch.Tensor,
+        next_observation: torch.Tensor,
+    ):
+        if key not in self._next_index:
+            device = (
+                observation.device
+                if self.device == "auto"
+                else torch.device(self.device)
+            )
+            self._next_index[key] = torch.full(
+                (self.max_size,), -1, dtype=torch.long, device=device
+            )
+            self._overflow_slot[key] = torch.zeros(0, dtype=torch.long, device=device)
+            self._overflow_cursor[key] = 0
+        next_index = self._next_index[key]
+        index = index.to(next_index.device)
+        observation = observation.to(next_index.device)
+        next_observation = next_observation.to(next_index.device)
+
+        # The next observation of a frame is the observation of the following slot
+        # if that slot is written together with it and holds the same values
+        is_successor = torch.zeros_like(index, dtype=torch.bool)
+        if len(index) > 1:
+            is_successor[:-1] = (index[1:] == index[:-1] + 1) & (
+                next_observation[:-1] == observation[1:]
+            ).reshape(len(index) - 1, -1).all(-1)
+
+        next_index[index] = -1
+        overflow_slots = index[~is_successor]
+        overflow_index = self._allocate(key, overflow_slots)
+        overflow = next_observation[~is_successor]
+        if key in self.codecs:
+            overflow = self.codecs[key].encode(overflow)
+        if key not in self._overflow:
+            self._overflow[key] = overflow.new_zeros(
+                (len(self._overflow_slot[key]), *overflow.shape[1:])
+            )
+        elif len(self._overflow[key]) < len(self._overflow_slot[key]):
+            self._overflow[key] = torch.cat(
+                [
+                    self._overflow[key],
+                    overflow.new_zeros(
+                        (
+                            len(self._overflow_slot[key]) - len(self._overflow[key]),
+                            *overflow.shape[1:],
+                        )
+                    ),
+                ]
+            )
+        self._overflow[key][overflow_index] = overflow
+        self._overflow_slot[key][overflow_index] = overflow_slots
+        next_index[overflow_slots] = overflow_index
+
+    def _allocate(self, key: NestedKey, slots: torch.Tensor) -> torch.Tensor:
+        """Returns the overflow indices for the next observations of ``slots``, growing the overflow buffer if needed."""
+        n = len(slots)
+        overflow_slot = self._overflow_slot[key]
+        size = len(overflow_slot)
+        if n <= size:
+            overflow_index = (
+                self._overflow_cursor[key]
+                + torch.arange(n, device=overflow_slot.device)
+            ) % size
+            owner = overflow_slot[overflow_index]
+            # An entry is still in use if the slot that wrote it still points to it
+            in_use = (owner >= 0) & (
+                self._next_index[key][owner.clamp(min=0)] == overflow_index
+            )
+            if not in_use.any():
+                self._overflow_cursor[key] = (self._overflow_cursor[key] + n) % size
+                return overflow_index
+
+        new_size = max(2 * size, size + n)
+        self._overflow_slot[key] = torch.cat(
+            [overflow_slot, overflow_slot.new_full((new_size - size,), -1)]
+        )
+        self._overflow_cursor[key] = (size + n) % new_size
+        return torch.arange(size, size + n, device=overflow_slot.device)
+
+    def _decode(self, data: TensorDictBase) -> TensorDictBase:
+        decoded = super()._decode(data)
+        for key in self.dedup_keys:
+            next_index = self._next_index[key][
+                self._index.to(self._next_index[key].device)
+            ]
+            following = self._get_decoded(
+                key, (self._index + 1).clamp(max=self.max_size - 1)
+            )
+            overflow = self._overflow[key][next_index.clamp(min=0)]
+            if key in self.codecs:
+                overflow = self.codecs[key].decode(
+                    overflow.reshape(-1, *overflow.shape[next_index.ndim :])
+                )
+                overflow = overflow.reshape(following.shape)
+            is_successor = (next_index < 0).reshape(
+                next_index.shape + (1,) * (following.ndim - next_index.ndim)
+            )
+            decoded.set(
+                ("next", *key),
+                torch.where(
+                    is_successor.to(following.device),
+                    following,
+                    overflow.to(following.device),
+                ),
+            )
+        return decoded
+
+    def set(
+        self,
+        cursor: Union[int, Sequence[int], slice],
+        data: TensorDictBase,
+    ):
+        self._index = self._as_index(cursor)
+        return super().set(cursor, data)
+
+    def get(self, index: Union[int, Sequence[int], slice]) -> Any:
+        self._index = self._as_index(index)
+        return super().get(index)
+
+    def state_dict(self) -> Dict[str, Any]:
+        state_dict = super().state_dict()
+        state_dict["_dedup"] = {
+            "_next_index": self._next_index,
+            "_overflow": self._overflow,
+            "_overflow_slot": self._overflow_slot,
+            "_overflow_cursor": self._overflow_cursor,
+        }
+        return state_dict
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        state_dict = dict(state_dict)
+        dedup = state_dict.pop("_dedup")
+        super().load_state_dict(state_dict)
+        self._next_index = dedup["_next_index"]
+        self._overflow = dedup["_overflow"]
+        self._overflow_slot = dedup["_overflow_slot"]
+        self._overflow_cursor = dedup["_overflow_cursor"]
+
+
+class TieredStorage(TensorStorage):
+    """A storage that keeps the most recent frames in memory and all the frames in memory-mapped files on disk.
+
+    Frames are written to the in-memory hot tier (a ring of the last ``hot_size`` frames) and demoted to the
+    cold tier (a :class:`~torchrl.data.LazyMemmapStorage` of ``max_size`` frames) on a background thread.
+    Frames of the hot tier are read from memory, the others are read from disk, with one read of the sorted indices
+    per sampled batch. Disk reads block the caller, so batches should be sampled on a background thread
+    (e.g., by a :class:`~benchmarl.lib.replay_buffers.MinibatchPrefetcher`).
+
+    Frames have to be written in order of their index (e.g., by a :class:`~torchrl.data.replay_buffers.RoundRobinWriter`),
+    so that the hot tier holds the frames with the ``hot_size`` indices preceding the last written one.
+    Use it with :class:`~benchmarl.lib.replay_buffers.TieredSampler` to sample the hot tier more often.
+
+    Args:
+        max_size (int): the maximum number of elements in the storage
+        hot_size (int): the number of most recent frames kept in memory
+        scratch_dir (str, optional): the directory of the memory-mapped files. If None, a temporary directory is used
+        device (DEVICE_TYPING, optional): the device of the hot tier and of sampled data. Defaults to "cpu"
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        hot_size: int,
+        scratch_dir: Optional[str] = None,
+        device: DEVICE_TYPING = "cpu",
+    ):
+        super().__init__(storage=None, max_size=max_size, device=device)
+        if not 0 < hot_size < max_size:
+            raise ValueError(
+                f"hot_size ({hot_size}) must be positive and smaller than max_size ({max_size})"
+            )
+        self.hot_size = hot_size
+        self._hot = LazyTensorStorage(hot_size, device=device)
+        self._cold = LazyMemmapStorage(max_size, scratch_dir=scratch_dir)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # Pending demotions with the number of frames written before them
+        self._demotions: Deque[Tuple[int, Future]] = deque()
+        self._n_written = 0
+        self._last_index = -1
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def n_hot(self) -> int:
+        """The number of frames in the hot tier."""
+        return min(self.hot_size, self._n_written, self._len)
+
+    def hot_index(self, age: torch.Tensor) -> torch.Tensor:
+        """The indices of the frames written ``age`` frames before the last one (``age`` must be smaller than :attr:`n_hot`)."""
+        return (self._last_index - age) % self.max_size
+
+    def set(self, cursor: Union[int, Sequence[int], slice], data: TensorDictBase):
+        if isinstance(cursor, slice):
+            index = torch.arange(self.max_size)[cursor]
+        else:
+            index = torch.as_tensor(cursor, dtype=torch.long).reshape(-1)
+            if data.batch_dims == 0:
+                data = data.unsqueeze(0)
+        n_frames = len(index)
+
+        # The hot tier is a ring filled in the order frames are written
+        n_hot_frames = min(n_frames, self.hot_size)
+        self._hot.set(
+            (self._n_written + torch.arange(n_frames - n_hot_frames, n_frames))
+            % self.hot_size,
+            data[n_frames - n_hot_frames :],
+        )
+
+        while len(self._demotions) and self._demotions[0][1].done():
+            self._demotions.popleft()[1].result()
+        self._demotions.append(
+            (
+                self._n_written,
+                self._executor.submit(self._cold.set, index, data.to("cpu").clone()),
+            )
+        )
+        self._n_written += n_frames
+        self._last_index = int(index[-1])
+        self._len = max(self._len, int(index.max()) + 1)
+
+    def get(self, index: Union[int, Sequence[int], slice]) -> Any:
+        if isinstance(index, slice):
+            index = torch.arange(self.max_size)[index]
+        index = torch.as_tensor(index, dtype=torch.long)
+        if index.ndim == 0:
+            return self.get(index.unsqueeze(0))[0]
+        age = (self._last_index - index) % self.max_size
+        is_hot = age < self.n_hot
+        if is_hot.all():
+            return self._hot.get((self._n_written - 1 - age) % self.hot_size)
+
+        # Frames outside of the hot tier were written at least hot_size frames ago
+        self._wait_demotions(self._n_written - self.hot_size)
+        cold_index, inverse = torch.unique(index[~is_hot], return_inverse=True)
+        cold_data = self._cold.get(cold_index)[inverse].to(self.device)
+        hot_data = self._hot.get((self._n_written - 1 - age[is_hot]) % self.hot_size)
+        data = torch.cat([hot_data, cold_data], 0)
+        order = torch.cat([is_hot.nonzero(), (~is_hot).nonzero()]).squeeze(-1)
+        return data[torch.argsort(order)]
+
+    def _wait_demotions(self, n_written: Optional[int] = None):
+        """Waits for the demotions started before ``n_written`` frames were written (all of them if None)."""
+        while len(self._demotions) and (
+            n_written is None or self._demotions[0][0] < n_written
+        ):
+            self._demotions.popleft()[1].result()
+
+    def state_dict(self) -> Dict[str, Any]:
+        self._wait_demotions()
+        return {
+            "_hot": self._hot.state_dict(),
+            "_cold": self._cold.state_dict(),
+            "_n_written": self._n_written,
+            "_last_index": self._last_index,
+            "_len": self._len,
+        }
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        self._wait_demotions()
+        self._hot.load_state_dict(state_dict["_hot"])
+        self._cold.load_state_dict(state_dict["_cold"])
+        self._n_written = state_dict["_n_written"]
+        self._last_index = state_dict["_last_index"]
+        self._len = state_dict["_len"]
+
+    def dumps(self, path):
+        self._wait_demotions()
+        path = Path(path)
+        path.mkdir(exist_ok=True)
+        self._hot.dumps(path / "hot")
+        self._cold.dumps(path / "cold")
+        with open(path / "storage_metadata.json", "w") as file:
+            json.dump(
+                {
+                    "hot_size": self.hot_size,
+                    "max_size": self.max_size,
+                    "_n_written": self._n_written,
+                    "_last_index": self._last_index,
+                    "_len": self._len,
+                },
+                file,
+            )
+
+    def loads(self, path):
+        self._wait_demotions()
+        path = Path(path)
+        with open(path / "storage_metadata.json", "r") as file:
+            metadata = json.load(file)
+        if (metadata["hot_size"], metadata["max_size"]) != (
+            self.hot_size,
+            self.max_size,
+        ):
+            raise ValueError(
+                f"Cannot load a {type(self).__name__} with hot_size {metadata['hot_size']} and "
+                f"max_size {metadata['max_size']} into one with hot_size {self.hot_size} and max_size {self.max_size}"
+            )
+        for storage, name in ((self._hot, "hot"), (self._cold, "cold")):
+            if not storage.initialized:
+                # Loading into an empty storage would map the saved files,
+                # so the tier is allocated in memory or in its scratch dir first
+                storage._init(TensorDict.load_memmap(path / name)[0])
+            storage.loads(path / name)
+        self._n_written = metadata["_n_written"]
+        self._last_index = metadata["_last_index"]
+        self._len = metadata["_len"]
+
+    def _empty(self):
+        self._wait_demotions()
+        self._hot._empty()
+        self._cold._empty()
+        self._n_written = 0
+        self._last_index = -1
+        self._len = 0
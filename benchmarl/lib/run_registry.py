@@ -0,0 +1,181 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+import dataclasses
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import benchmarl
+
+from benchmarl.conf.algorithm.cfg_common import AlgorithmConfig
+from benchmarl.conf.environment import Task
+from benchmarl.conf.experiment.common import ExperimentConfig
+from benchmarl.lib.experiment.callback import Callback
+from benchmarl.lib.models.common import ModelConfig
+
+# Experiment config fields that only affect bookkeeping (where and how results are stored)
+# and not the results themselves. They are left out of the run hash.
+_BOOKKEEPING_FIELDS = {
+    "sampling_device",
+    "train_device",
+    "loggers",
+    "create_json",
+    "render",
+    "save_folder",
+    "restore_file",
+    "checkpoint_interval",
+    "checkpoint_at_end",
+    "spec_cache_folder",
+}
+
+_COMPLETED_FILE = "completed.json"
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    if dataclasses.is_dataclass(value):
+        return _config_to_dict(value)
+    return str(value)
+
+
+def _config_to_dict(config: Any) -> Dict[str, Any]:
+    return {
+        "_class": _to_json(type(config)),
+        **{
+            field.name: getattr(config, field.name)
+            for field in dataclasses.fields(config)
+        },
+    }
+
+
+class RunRegistry:
+    """A content-addressed registry of experiment runs.
+
+    Each run is identified by a hash of its resolved configuration (task, algorithm, models,
+    seed, experiment hyperparameters and BenchMARL version).
+    Runs are stored in ``folder/<run_hash>`` and are marked as completed when they finish.
+    This allows benchmarks to skip runs that have already been completed,
+    resume interrupted runs from their latest checkpoint, and only schedule the missing ones.
+
+    Args:
+        folder (str): the folder where the runs are stored
+
+    Examples:
+        >>> registry = RunRegistry("/path/to/runs")
+        >>> benchmark = Benchmark(..., run_registry=registry)
+        >>> benchmark.run_sequential()  # Only the runs missing from the registry are run
+    """
+
+    def __init__(self, folder: str):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def run_hash(
+        task: Task,
+        algorithm_config: AlgorithmConfig,
+        model_config: ModelConfig,
+        critic_model_config: ModelConfig,
+        seed: int,
+        experiment_config: ExperimentConfig,
+    ) -> str:
+        """
+        Computes the hash identifying a run.
+
+        Args:
+            task (Task): the task configuration
+            algorithm_config (AlgorithmConfig): the algorithm configuration
+            model_config (ModelConfig): the policy model configuration
+            critic_model_config (ModelConfig): the critic model configuration
+            seed (int): the seed of the run
+            experiment_config (ExperimentConfig): the experiment config
+
+        Returns: the hex digest of the run hash
+        """
+        experiment_dict = {
+            key: value
+            for key, value in _config_to_dict(experiment_config).items()
+            if key not in _BOOKKEEPING_FIELDS
+        }
+        run_dict = {
+            "version": benchmarl.__version__,
+            "task": {
+                "env": task.env_name(),
+                "name": task.name.lower(),
+                "config": task.config,
+            },
+            "algorithm": _config_to_dict(algorithm_config),
+            "model": _config_to_dict(model_config),
+            "critic_model": _config_to_dict(critic_model_config),
+            "seed": seed,
+            "experiment": experiment_dict,
+        }
+        run_string = json.dumps(run_dict, sort_keys=True, default=_to_json)
+        return hashlib.sha256(run_string.encode()).hexdigest()[:16]
+
+    def run_folder(self, run_hash: str) -> Path:
+        """The folder where the experiment of the run is saved."""
+        return self.folder / run_hash
+
+    def is_completed(self, run_hash: str) -> bool:
+        """Whether the run has already been completed."""
+        return (self.run_folder(run_hash) / _COMPLETED_FILE).exists()
+
+    def latest_checkpoint(self, run_hash: str) -> Optional[Path]:
+        """
+        The latest checkpoint of an interrupted run.
+
+        Returns: the path to the checkpoint with the most frames, or None if the run has no checkpoints
+        """
+        checkpoints = list(
+            self.run_folder(run_hash).glob("*/checkpoints/checkpoint_*.pt")
+        )
+        if not len(checkpoints):
+            return None
+        return max(checkpoints, key=lambda path: int(path.stem[len("checkpoint_") :]))
+
+    def mark_completed(self, run_hash: str, experiment) -> None:
+        """
+        Marks a run as completed.
+
+        Args:
+            run_hash (str): the hash of the run
+            experiment (Experiment): the completed experiment
+        """
+        with open(self.run_folder(run_hash) / _COMPLETED_FILE, "w") as f:
+            json.dump(
+                {
+                    "folder": str(experiment.folder_name),
+                    "json_file": str(
+                        experiment.folder_name / f"{experiment.name}.json"
+                    ),
+                    "total_frames": experiment.total_frames,
+                },
+                f,
+                indent=4,
+            )
+
+    def completion_callback(self, run_hash: str) -> Callback:
+        """
+        A callback that marks the run as completed when its experiment has collected all its frames.
+
+        Args:
+            run_hash (str): the hash of the run
+        """
+        return _MarkCompleted(self, run_hash)
+
+
+class _MarkCompleted(Callback):
+    def __init__(self, run_registry: RunRegistry, run_hash: str):
+        super().__init__()
+        self.run_registry = run_registry
+        self.run_hash = run_hash
+
+    def on_experiment_end(self):
+        self.run_registry.mark_completed(self.run_hash, self.experiment)
@@ -0,0 +1,240 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+import copy
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from benchmarl.conf.algorithm.cfg_common import AlgorithmConfig
+from benchmarl.conf.environment import Task
+from benchmarl.lib.benchmark import Benchmark
+from benchmarl.lib.experiment import Experiment
+
+
+@dataclass
+class Trial:
+    """A single (algorithm, task, seed) experiment of a benchmark scheduled by the :class:`AshaScheduler`."""
+
+    algorithm_config: AlgorithmConfig
+    task: Task
+    seed: int
+    # Index of the bracket (task) the trial competes in
+    bracket: int
+    # Highest rung the trial has completed, -1 if it has not started
+    rung: int = -1
+    # Mean evaluation return at the end of each completed rung
+    scores: Dict[int, float] = field(default_factory=dict)
+    # Checkpoint the trial is resumed from when promoted
+    checkpoint: Optional[Path] = None
+    # Folder of the experiment
+    folder: Optional[Path] = None
+
+    @property
+    def score(self) -> float:
+        """The score of the trial at its highest completed rung."""
+        return _score(self, self.rung)
+
+
+def _score(trial: Trial, rung: int) -> float:
+    score = trial.scores.get(rung, None)
+    return score if score is not None else -math.inf
+
+
+class AshaScheduler:
+    """Asynchronous successive halving (ASHA) scheduler for benchmarks.
+
+    From https://arxiv.org/abs/1810.05934
+
+    Instead of training every experiment in the benchmark for the full ``max_n_frames``,
+    all experiments are first trained for ``min_frames``. An experiment is then promoted to the next
+    rung (``reduction_factor`` times more frames) only if it is in the top ``1 / reduction_factor``
+    of the experiments that completed its current rung on the same task.
+    Experiments are paused at the end of each rung by checkpointing them and are resumed from their
+    checkpoint when promoted, so no training is ever repeated.
+    Experiments that are not promoted are left paused.
+
+    The score of an experiment at a rung is its mean evaluation return at the end of the rung,
+    thus ``min_frames`` has to be a multiple of the experiment ``evaluation_interval``.
+
+    Args:
+        benchmark (Benchmark): the benchmark to schedule
+        min_frames (int): the frames each experiment is trained for in the first rung
+        reduction_factor (int): the ratio between the frames of two consecutive rungs
+            and the inverse of the fraction of experiments promoted at each rung. Defaults to 3
+
+    Examples:
+        >>> benchmark = Benchmark(...)
+        >>> scheduler = AshaScheduler(benchmark, min_frames=60_000, reduction_factor=3)
+        >>> trials = scheduler.run_sequential()
+
+    """
+
+    def __init__(
+        self,
+        benchmark: Benchmark,
+        min_frames: int,
+        reduction_factor: int = 3,
+    ):
+        self.benchmark = benchmark
+        self.min_frames = min_frames
+        self.reduction_factor = reduction_factor
+
+        self.trials = [
+            Trial(
+                algorithm_config=algorithm_config,
+                task=task,
+                seed=seed,
+                bracket=bracket,
+            )
+            for algorithm_config in self.benchmark.algorithm_configs
+            for bracket, task in enumerate(self.benchmark.tasks)
+            for seed in self.benchmark.seeds
+        ]
+        self._validate()
+
+    def _validate(self):
+        experiment_config = self.benchmark.experiment_config
+        if self.reduction_factor < 2:
+            raise ValueError(
+                f"reduction_factor ({self.reduction_factor}) has to be at least 2"
+            )
+        if experiment_config.restore_file is not None:
+            raise ValueError("Experiments scheduled by ASHA cannot be restored")
+        if not experiment_config.evaluation or (
+            not len(experiment_config.loggers) and not experiment_config.create_json
+        ):
+            raise ValueError(
+                "ASHA ranks experiments on their evaluation return, "
+                "evaluation has to be enabled with at least one logger or create_json"
+            )
+        for algorithm_config in self.benchmark.algorithm_configs:
+            on_policy = algorithm_config.on_policy()
+            max_frames = experiment_config.get_max_n_frames(on_policy)
+            for rung in range(self.n_rungs(on_policy) - 1):
+                frames = self.rung_frames(rung, on_policy)
+                if frames % experiment_config.evaluation_interval != 0:
+                    raise ValueError(
+                        f"The frames of rung {rung} ({frames}) are not a multiple "
+                        f"of the evaluation_interval ({experiment_config.evaluation_interval})"
+                    )
+            if self.min_frames >= max_frames:
+                raise ValueError(
+                    f"min_frames ({self.min_frames}) has to be lower than "
+                    f"the max frames of the experiments ({max_frames})"
+                )
+
+    def n_rungs(self, on_policy: bool) -> int:
+        """The number of rungs, the last one trains for the full experiment frames."""
+        max_frames = self.benchmark.experiment_config.get_max_n_frames(on_policy)
+        n_rungs = 1
+        while self.min_frames * self.reduction_factor ** (n_rungs - 1) < max_frames:
+            n_rungs += 1
+        return n_rungs
+
+    def rung_frames(self, rung: int, on_policy: bool) -> int:
+        """The total number of frames an experiment has been trained for at the end of ``rung``."""
+        return min(
+            self.min_frames * self.reduction_factor**rung,
+            self.benchmark.experiment_config.get_max_n_frames(on_policy),
+        )
+
+    def _get_job(self) -> Optional[Tuple[Trial, int]]:
+        # Promotions come first, starting from the highest rungs
+        for bracket in range(len(self.benchmark.tasks)):
+            trials = [trial for trial in self.trials if trial.bracket == bracket]
+            max_rung = max(
+                self.n_rungs(trial.algorithm_config.on_policy()) for trial in trials
+            )
+            for rung in reversed(range(max_rung - 1)):
+                completed = sorted(
+                    (
+                        trial
+                        for trial in trials
+                        if trial.rung >= rung
+                        and rung < self.n_rungs(trial.algorithm_config.on_policy()) - 1
+                    ),
+                    key=lambda trial: _score(trial, rung),
+                    reverse=True,
+                )
+                for trial in completed[: len(completed) // self.reduction_factor]:
+                    if trial.rung == rung:
+                        return trial, rung + 1
+        # Otherwise we grow the bottom rung
+        for trial in self.trials:
+            if trial.rung == -1:
+                return trial, 0
+        return None
+
+    def _run_trial(self, trial: Trial, rung: int):
+        on_policy = trial.algorithm_config.on_policy()
+        experiment_config = copy.deepcopy(self.benchmark.experiment_config)
+        experiment_config.max_n_frames = self.rung_frames(rung, on_policy)
+        experiment_config.max_n_iters = None
+        experiment_config.checkpoint_at_end = True
+        if trial.checkpoint is not None:
+            experiment_config.save_folder = None
+            experiment_config.restore_file = str(trial.checkpoint)
+
+        experiment = Experiment(
+            task=trial.task,
+            algorithm_config=trial.algorithm_config,
+            seed=trial.seed,
+            model_config=self.benchmark.model_config,
+            critic_model_config=self.benchmark.critic_model_config,
+            config=experiment_config,
+        )
+        try:
+            experiment.run()
+        except KeyboardInterrupt as interrupt:
+            print("\n\nBenchmark was closed gracefully\n\n")
+            experiment.close()
+            raise interrupt
+
+        trial.rung = rung
+        trial.scores[rung] = experiment.mean_eval_return
+        trial.folder = experiment.folder_name
+        trial.checkpoint = (
+            experiment.folder_name
+            / "checkpoints"
+            / f"checkpoint_{experiment.total_frames}.pt"
+        )
+
+    def run_sequential(self) -> List[Trial]:
+        """Run the benchmark experiments in a sequence, until no experiment can be promoted.
+
+        Returns: the trials, with the score of each rung they completed
+        """
+        i = 0
+        while True:
+            job = self._get_job()
+            if job is None:
+                break
+            trial, rung = job
+            i += 1
+            print(
+                f"\nRunning job {i}: {trial.algorithm_config.associated_class().__name__.lower()} "
+                f"on {trial.task.name.lower()} with seed {trial.seed}, rung {rung} "
+                f"({self.rung_frames(rung, trial.algorithm_config.on_policy())} frames).\n"
+            )
+            self._run_trial(trial, rung)
+
+        run_frames = sum(
+            self.rung_frames(trial.rung, trial.algorithm_config.on_policy())
+            for trial in self.trials
+        )
+        full_frames = sum(
+            self.benchmark.experiment_config.get_max_n_frames(
+                trial.algorithm_config.on_policy()
+            )
+            for trial in self.trials
+        )
+        print(
+            f"\nASHA trained for {run_frames} frames "
+            f"({100 * run_frames / full_frames:.1f}% of the full benchmark).\n"
+        )
+        return self.trials
@@ -6,7 +6,7 @@
 
 import importlib
 from dataclasses import field
-from typing import Any, Dict, Union
+from typing import Any, Callable, Dict, Iterator, Mapping, Union
 
 import torch
 import yaml
@@ -23,6 +23,42 @@ def _class_from_name(name: str):
     return c
 
 
+class _LazyRegistry(Mapping):
+    """A registry mapping names to objects which are only imported when first accessed.
+
+    Args:
+        paths (dict): a mapping from names to the dotted import paths of the objects
+        loader (callable, optional): the function used to import an object from its path.
+            Defaults to importing the last path component from the module named by the previous ones.
+    """
+
+    def __init__(
+        self,
+        paths: Dict[str, str],
+        loader: Callable[[str], Any] = _class_from_name,
+    ):
+        self._paths = paths
+        self._loader = loader
+        self._loaded = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._loaded:
+            self._loaded[name] = self._loader(self._paths[name])
+        return self._loaded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._paths
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self._paths)})"
+
+
 def _read_yaml_config(config_file: str) -> Dict[str, Any]:  # TODO get rid of all yaml
     with open(config_file) as config:
         yaml_string = config.read()
@@ -11,10 +11,11 @@ from argparse import ArgumentParser
 from dataclasses import dataclass
 from importlib import metadata as importlib_metadata
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
 from eztils import abspath, datestr, setup_path
-from eztils.argparser import HfArgumentParser, update_dataclass_defaults
+from eztils.argparser import HfArgumentParser
 from rich import print
 
 from benchmarl.lib.experiment.experiment import Experiment
@@ -54,7 +55,68 @@ def import_module(prefix, path):
     return getattr(importlib.import_module(f"{prefix}.{'.'.join(module_path)}"), attr)
 
 
-def setup_experiment():
+def parse_launch_args(argv: Optional[List[str]] = None):
+    """
+    Parses the arguments selecting what to launch, the remaining ones are the config values.
+    """
+    parser = ArgumentParser(add_help=False)
+    parser.add_argument("-c", "--config", type=str)  # the config.json of a previous run
+    parser.add_argument(
+        "-s", "--sweep", type=str
+    )  # a json file with a list of configs in the config.json format, run back to back
+    parser.add_argument("-a", "--algorithm", type=str)
+    parser.add_argument("-t", "--task", type=str)
+    parser.add_argument("-h", "--help", action="store_true")
+    return parser.parse_known_args(argv)
+
+
+def resolve_config(
+    config: Optional[Dict[str, Any]],
+    algorithm: Optional[str],
+    task: Optional[str],
+    argv: List[str],
+    print_help: bool = False,
+):
+    """
+    Resolves the algorithm and task dataclasses in a single pass.
+
+    Precedence order goes config < algorithm/task defaults < specific parameters in argv.
+    Values in the config are only used if it is for the same algorithm/task.
+    """
+    config = config if config is not None else {}
+    algorithm = algorithm or config.get("_algorithm", DefaultParams.algorithm)
+    task = task or config.get("_task", DefaultParams.task)
+
+    algorithm_config = import_module("benchmarl.conf.algorithm", algorithm)
+    task_config = import_module("benchmarl.conf.environment", task)
+
+    parser = HfArgumentParser((algorithm_config, task_config))
+    if print_help:
+        parser.print_help(sys.stdout)
+        sys.exit(0)
+
+    defaults = {}
+    for key, name, dataclass_type in (
+        ("_algorithm", algorithm, algorithm_config),
+        ("_task", task, task_config),
+    ):
+        if config.get(key) == name:
+            defaults.update(
+                {
+                    field.name: config[field.name]
+                    for field in dataclasses.fields(dataclass_type)
+                    if field.name in config
+                }
+            )
+    parser.set_defaults(**defaults)
+
+    *conf, _ = parser.parse_args_into_dataclasses(
+        args=argv, return_remaining_strings=True, look_for_args_file=False
+    )
+    return conf, algorithm, task
+
+
+def setup_experiment(log_dir: Optional[Path] = None):
     """
     Sets up the experiment by creating a run directory and a log directory, and creating a symlink from the repo directory to the run directory.
     """
@@ -64,7 +126,7 @@ def setup_experiment():
 
     # create run dir
     RUN_DIR = setup_path(DATA_ROOT / "runs")
-    LOG_DIR = setup_path(RUN_DIR / datestr())
+    LOG_DIR = setup_path(log_dir if log_dir is not None else RUN_DIR / datestr())
 
     print(f"LOG DIR: {LOG_DIR}")
 
@@ -75,80 +137,23 @@ def setup_experiment():
 
     os.chdir(LOG_DIR)
 
-    """
-    SETUP CONFIG
-    precedence order goes config_file < algorithm/task < specific parameters
-    """
-    # TODO generalize to support an arbitrary amount of default parameters rather than just algorithm and task (use for loops and dictionary)
-
-    # setup algorithm and task defaults
-    parser = ArgumentParser()
-    parser.add_argument(
-        "-c", "--config", type=str
-    )  # a folder with the respective config.jsons
-
-    args, *_ = parser.parse_known_args()
-    config_file = args.config
-    if config_file is not None:
-        with open(config_file, "r") as config:
-            config = json.load(config)
-        DefaultParams.algorithm = config["_algorithm"]
-        DefaultParams.task = config["_task"]
-
-    # get algorithma and task configs
-    parser.add_argument("-a", "--algorithm", type=str, default=DefaultParams.algorithm)
-    parser.add_argument("-t", "--task", type=str, default=DefaultParams.task)
-    args, *_ = parser.parse_known_args()
-
-    algorithm_config = import_module("benchmarl.conf.algorithm", args.algorithm)
-    task_config = import_module("benchmarl.conf.environment", args.task)
-
-    # now parse the actual dataclasses specified by the configs
-    parser = HfArgumentParser((algorithm_config, task_config))
-    parser.print_help(sys.stdout)
-
-    *conf, _ = parser.parse_args_into_dataclasses(return_remaining_strings=True)
-
-    # python benchmarl -a cfg_vdn/NoDelayVdnConfig -t vmas/balance
-
-    if (
-        config_file is not None
-    ):  # overwrite the default alg and task params according to the config file
-        og_algorithm_config, og_task_config = parser.parse_json_file(
-            config_file, allow_extra_keys=True
-        )
-        if (
-            DefaultParams.algorithm == config["_algorithm"]
-        ):  # only overwrite default alg params with config if user didn't specify new algorithm
-            algorithm_config = update_dataclass_defaults(
-                algorithm_config, og_algorithm_config
-            )
-        if (
-            DefaultParams.task == config["_task"]
-        ):  # only overwrite default task params with config if user didn't specify new task
-            task_config = update_dataclass_defaults(task_config, og_task_config)
-
-        parser = HfArgumentParser((algorithm_config, task_config))
-        *conf, _ = parser.parse_args_into_dataclasses(return_remaining_strings=True)
-
-    parser.to_json(conf, LOG_DIR / "config.json")
 
-    # add the algorithm and task
-    with open(LOG_DIR / "config.json", "r") as config:
-        serialized_cfg = json.load(config)
-        serialized_cfg["_algorithm"] = args.algorithm
-        serialized_cfg["_task"] = args.task
+def save_config(conf, algorithm: str, task: str):
+    """Writes the resolved config, with its algorithm and task, to LOG_DIR / config.json"""
+    serialized_cfg = {}
+    for dataclass_config in conf:
+        serialized_cfg.update(dataclasses.asdict(dataclass_config))
+    serialized_cfg["_algorithm"] = algorithm
+    serialized_cfg["_task"] = task
     with open(LOG_DIR / "config.json", "w") as config:
         json.dump(serialized_cfg, config)
 
-    return conf
 
-
-def main():
-    algorithm_config, task_config = conf = setup_experiment()
+def run_experiment(conf, task: str):
+    algorithm_config, task_config = conf
     from benchmarl.conf.environment import task_config_registry
 
-    task_key = ".".join(DefaultParams.task.split(".")[:-1])
+    task_key = ".".join(task.split(".")[:-1])
     experiment = Experiment(
         task=task_config_registry[task_key].update_config(
             dataclasses.asdict(task_config)
@@ -167,5 +172,34 @@ def main():
     experiment.run()
 
 
+def main(argv: Optional[List[str]] = None):
+    args, remaining = parse_launch_args(argv)
+
+    if args.sweep is not None:
+        # Launching many experiments in the same process saves the python and torch startup for each of them
+        with open(args.sweep, "r") as sweep:
+            configs = json.load(sweep)
+    elif args.config is not None:
+        with open(args.config, "r") as config:
+            configs = [json.load(config)]
+    else:
+        configs = [None]
+
+    sweep_dir = None
+    for i, config in enumerate(configs):
+        conf, algorithm, task = resolve_config(
+            config, args.algorithm, args.task, remaining, print_help=args.help
+        )
+        if args.sweep is not None:
+            # Experiments in a sweep can start within the same second, they get one folder each
+            if sweep_dir is None:
+                sweep_dir = DATA_ROOT / "runs" / f"{datestr()}_sweep"
+            setup_experiment(sweep_dir / f"sweep_{i}")
+        else:
+            setup_experiment()
+        save_config(conf, algorithm, task)
+        run_experiment(conf, task)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,148 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+"""Benchmarks the forward backends of the Gnn model.
+
+For every combination of number of agents, batch size, gnn class and parameter sharing,
+a Gnn on the full topology is built with each backend and the time of a forward and backward pass is measured:
+
+- ``dense``: the dense forward of ``benchmarl.lib.models.dense_gnn``
+- ``torch_geometric``: torch_geometric message passing on the batched graphs
+
+The full topology fast path of GraphConv is disabled, so that both backends do message passing.
+Results are printed as json, for example::
+
+    python scripts/benchmark_gnn.py --n-agents 4 16 64 --batch-sizes 10 6000 --gnn-classes GraphConv GATv2Conv
+"""
+
+import itertools
+import json
+import statistics
+import time
+from argparse import ArgumentParser
+
+import torch
+import torch_geometric
+from tensordict import TensorDict
+from torchrl.data import CompositeSpec, UnboundedContinuousTensorSpec
+
+from benchmarl.lib.models.gnn import Gnn
+
+GROUP = "agents"
+
+
+def _make_gnn(
+    gnn_class: str,
+    n_agents: int,
+    features: int,
+    share_params: bool,
+    dense: bool,
+    device: str,
+) -> Gnn:
+    def spec():
+        return CompositeSpec(
+            {
+                GROUP: CompositeSpec(
+                    {"x": UnboundedContinuousTensorSpec((n_agents, features))},
+                    shape=(n_agents,),
+                )
+            }
+        )
+
+    gnn = Gnn(
+        topology="full",
+        self_loops=False,
+        gnn_class=getattr(torch_geometric.nn, gnn_class),
+        gnn_kwargs={},
+        dense_max_agents=n_agents if dense else 0,
+        input_spec=spec(),
+        output_spec=spec(),
+        agent_group=GROUP,
+        input_has_agent_dim=True,
+        n_agents=n_agents,
+        centralised=False,
+        share_params=share_params,
+        device=device,
+        action_spec=None,
+    )
+    gnn.dense_full_graph = False
+    return gnn
+
+
+def benchmark(
+    gnn_class: str,
+    n_agents: int,
+    batch_size: int,
+    share_params: bool,
+    features: int,
+    device: str,
+    repeats: int,
+) -> dict:
+    results = {
+        "gnn_class": gnn_class,
+        "n_agents": n_agents,
+        "batch_size": batch_size,
+        "share_params": share_params,
+    }
+    input = TensorDict(
+        {
+            GROUP: TensorDict(
+                {"x": torch.randn(batch_size, n_agents, features, device=device)},
+                [batch_size, n_agents],
+            )
+        },
+        [batch_size],
+    )
+    for backend in ("dense", "torch_geometric"):
+        gnn = _make_gnn(
+            gnn_class,
+            n_agents,
+            features,
+            share_params,
+            dense=backend == "dense",
+            device=device,
+        )
+        times = []
+        for _ in range(repeats + 1):
+            start = time.perf_counter()
+            gnn(input.clone()).get((GROUP, "x")).sum().backward()
+            if device != "cpu":
+                torch.cuda.synchronize()
+            times.append(time.perf_counter() - start)
+        # The first call builds the cached graphs
+        results[f"{backend}_ms"] = statistics.median(times[1:]) * 1000
+    results["speedup"] = results["torch_geometric_ms"] / results["dense_ms"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--n-agents", type=int, nargs="+", default=[3, 8, 20, 50])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument(
+        "--gnn-classes", type=str, nargs="+", default=["GraphConv", "GATv2Conv"]
+    )
+    parser.add_argument("--features", type=int, default=32)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    results = [
+        benchmark(
+            gnn_class=gnn_class,
+            n_agents=n_agents,
+            batch_size=batch_size,
+            share_params=share_params,
+            features=args.features,
+            device=args.device,
+            repeats=args.repeats,
+        )
+        for gnn_class, n_agents, batch_size, share_params in itertools.product(
+            args.gnn_classes, args.n_agents, args.batch_sizes, (True, False)
+        )
+    ]
+    print(json.dumps(results, indent=4))
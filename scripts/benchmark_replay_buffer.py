@@ -0,0 +1,264 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+"""Benchmarks the off-policy replay buffers built by ``Algorithm.get_replay_buffer``.
+
+For every combination of memory size, number of agents, observation size, minibatch size,
+storage option and sampler option, a buffer is built for one agent group with the specs of a
+VMAS-like task (bounded per-agent observations, continuous per-agent actions, per-agent rewards
+and global done flags) and the following calls are timed on synthetic data:
+
+- ``extend``: extending the buffer with collected batches until it is full
+- ``sample``: sampling minibatches from the full buffer
+- ``update_priority``: updating the priorities of the sampled minibatches (prioritized sampler only)
+
+Each call is reported in frames per second, together with the bytes per frame of the collected data
+and of the storage (computed from its state dict, so it includes the cold tier of tiered storages).
+Results are printed as json, for example::
+
+    python scripts/benchmark_replay_buffer.py --n-agents 4 16 --storages default float16 dedup
+"""
+
+import itertools
+import json
+import time
+from argparse import ArgumentParser
+from types import SimpleNamespace
+
+import torch
+from tensordict import TensorDict, TensorDictBase
+from torchrl.data import BoundedTensorSpec, CompositeSpec
+
+from benchmarl.lib.algorithms import algorithm_config_registry
+from benchmarl.lib.experiment import ExperimentConfig
+from benchmarl.lib.models import model_config_registry
+
+GROUP = "agents"
+
+# The experiment config overrides of each storage option
+STORAGES = {
+    "default": {},
+    "float16": {"off_policy_replay_buffer_observation_codec": "float16"},
+    "uint8": {"off_policy_replay_buffer_observation_codec": "uint8"},
+    "pack_bools": {"off_policy_replay_buffer_pack_bools": True},
+    "dedup": {"off_policy_replay_buffer_dedup_next_observation": True},
+    "tiered": {
+        "off_policy_replay_buffer_hot_size": 0.25,
+        "off_policy_n_prefetched_minibatches": 1,
+    },
+}
+
+# The experiment config overrides of each sampler option
+SAMPLERS = {
+    "uniform": {"off_policy_use_prioritized_replay_buffer": False},
+    "prioritized": {"off_policy_use_prioritized_replay_buffer": True},
+}
+
+
+def _make_experiment(
+    n_agents: int, observation_size: int, config: ExperimentConfig
+) -> SimpleNamespace:
+    # The attributes of Experiment read by the Algorithm
+    return SimpleNamespace(
+        config=config,
+        model_config=model_config_registry["mlp"](),
+        critic_model_config=model_config_registry["mlp"](),
+        on_policy=False,
+        group_map={GROUP: [f"agent_{i}" for i in range(n_agents)]},
+        observation_spec=CompositeSpec(
+            {
+                GROUP: CompositeSpec(
+                    {
+                        "observation": BoundedTensorSpec(
+                            -1, 1, (n_agents, observation_size)
+                        )
+                    },
+                    shape=(n_agents,),
+                )
+            }
+        ),
+        action_spec=CompositeSpec(
+            {
+                GROUP: CompositeSpec(
+                    {"action": BoundedTensorSpec(-1, 1, (n_agents, 2))},
+                    shape=(n_agents,),
+                )
+            }
+        ),
+        state_spec=None,
+        action_mask_spec=None,
+    )
+
+
+def _make_batch(n_frames: int, n_agents: int, observation_size: int) -> TensorDict:
+    # Consecutive frames of vectorized trajectories: the next observation of a frame is the observation
+    # of the following frame, unless the episode is done and the following frame is a reset
+    observation = torch.rand(n_frames + 1, n_agents, observation_size) * 2 - 1
+    done = torch.rand(n_frames, 1) < 0.01
+    next_observation = torch.where(
+        done.unsqueeze(-1),
+        torch.rand(n_frames, n_agents, observation_size) * 2 - 1,
+        observation[1:],
+    )
+    batch_size = [n_frames, n_agents]
+    return TensorDict(
+        {
+            GROUP: TensorDict(
+                {
+                    "observation": observation[:-1],
+                    "action": torch.rand(n_frames, n_agents, 2) * 2 - 1,
+                },
+                batch_size,
+            ),
+            "done": torch.zeros(n_frames, 1, dtype=torch.bool),
+            "terminated": torch.zeros(n_frames, 1, dtype=torch.bool),
+            "next": TensorDict(
+                {
+                    GROUP: TensorDict(
+                        {
+                            "observation": next_observation,
+                            "reward": torch.randn(n_frames, n_agents, 1),
+                        },
+                        batch_size,
+                    ),
+                    "done": done,
+                    "terminated": done.clone(),
+                },
+                [n_frames],
+            ),
+        },
+        [n_frames],
+    )
+
+
+def _n_bytes(state) -> int:
+    if isinstance(state, torch.Tensor):
+        return state.numel() * state.element_size()
+    if isinstance(state, TensorDictBase):
+        return sum(_n_bytes(tensor) for tensor in state.values(True, True))
+    if isinstance(state, dict):
+        return sum(_n_bytes(value) for value in state.values())
+    return 0
+
+
+def _time(fn, n_calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        fn()
+    return time.perf_counter() - start
+
+
+def benchmark(
+    algorithm: str,
+    memory_size: int,
+    n_agents: int,
+    observation_size: int,
+    minibatch_size: int,
+    storage: str,
+    sampler: str,
+    frames_per_batch: int,
+    n_samples: int,
+) -> dict:
+    config = ExperimentConfig(
+        sampling_device="cpu",
+        train_device="cpu",
+        off_policy_memory_size=memory_size,
+        off_policy_train_batch_size=minibatch_size,
+        **SAMPLERS[sampler],
+    )
+    for key, value in STORAGES[storage].items():
+        if key == "off_policy_replay_buffer_hot_size":
+            value = max(1, int(memory_size * value))
+        setattr(config, key, value)
+    config.validate(on_policy=False)
+    experiment = _make_experiment(n_agents, observation_size, config)
+    replay_buffer = (
+        algorithm_config_registry[algorithm]()
+        .get_algorithm(experiment=experiment)
+        .get_replay_buffer(group=GROUP)
+    )
+
+    batch = _make_batch(frames_per_batch, n_agents, observation_size)
+    n_extends = -(-memory_size // frames_per_batch)
+    extend_s = _time(lambda: replay_buffer.extend(batch), n_extends)
+
+    samples = []
+    sample_s = _time(lambda: samples.append(replay_buffer.sample()), n_samples)
+
+    results = {
+        "algorithm": algorithm,
+        "memory_size": memory_size,
+        "n_agents": n_agents,
+        "observation_size": observation_size,
+        "minibatch_size": minibatch_size,
+        "storage": storage,
+        "sampler": sampler,
+        "extend_frames_per_s": n_extends * frames_per_batch / extend_s,
+        "sample_frames_per_s": n_samples * minibatch_size / sample_s,
+    }
+    if sampler == "prioritized":
+        priority_key = replay_buffer.priority_key
+        for sample in samples:
+            sample.set(priority_key, torch.rand(sample.get(priority_key[:-1]).shape))
+        samples = iter(samples)
+        update_s = _time(
+            lambda: replay_buffer.update_tensordict_priority(next(samples)), n_samples
+        )
+        results["update_priority_frames_per_s"] = n_samples * minibatch_size / update_s
+    results["collected_bytes_per_frame"] = _n_bytes(batch) / frames_per_batch
+    results["stored_bytes_per_frame"] = _n_bytes(
+        replay_buffer._storage.state_dict()
+    ) / len(replay_buffer)
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--algorithm", type=str, default="masac")
+    parser.add_argument("--memory-sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--n-agents", type=int, nargs="+", default=[4])
+    parser.add_argument("--observation-sizes", type=int, nargs="+", default=[16])
+    parser.add_argument("--minibatch-sizes", type=int, nargs="+", default=[128])
+    parser.add_argument(
+        "--storages", type=str, nargs="+", default=list(STORAGES), choices=STORAGES
+    )
+    parser.add_argument(
+        "--samplers", type=str, nargs="+", default=list(SAMPLERS), choices=SAMPLERS
+    )
+    parser.add_argument("--frames-per-batch", type=int, default=6000)
+    parser.add_argument("--n-samples", type=int, default=100)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    results = [
+        benchmark(
+            algorithm=args.algorithm,
+            memory_size=memory_size,
+            n_agents=n_agents,
+            observation_size=observation_size,
+            minibatch_size=minibatch_size,
+            storage=storage,
+            sampler=sampler,
+            frames_per_batch=args.frames_per_batch,
+            n_samples=args.n_samples,
+        )
+        for (
+            memory_size,
+            n_agents,
+            observation_size,
+            minibatch_size,
+            storage,
+            sampler,
+        ) in itertools.product(
+            args.memory_sizes,
+            args.n_agents,
+            args.observation_sizes,
+            args.minibatch_sizes,
+            args.storages,
+            args.samplers,
+        )
+    ]
+    print(json.dumps(results, indent=4))
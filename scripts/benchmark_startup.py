@@ -0,0 +1,118 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+"""Benchmarks the startup time of BenchMARL.
+
+Each repetition runs in a fresh interpreter and measures, from its first statement:
+
+- ``import``: the time to import ``benchmarl.run``
+- ``setup``: the time to set up the experiment, as ``benchmarl.run:main`` does
+- ``first_step``: the time until the first batch has been collected
+
+Results are printed as json, for example::
+
+    python scripts/benchmark_startup.py --task vmas.balance --algorithm mappo --device cpu
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+_CHILD = """
+import json
+import time
+
+start = time.perf_counter()
+
+import benchmarl.run
+
+imported = time.perf_counter()
+
+from benchmarl.conf.environment import _load_config, task_config_registry
+from benchmarl.lib.algorithms import algorithm_config_registry
+from benchmarl.lib.experiment import Experiment, ExperimentConfig
+from benchmarl.lib.models import model_config_registry
+
+config = ExperimentConfig(
+    sampling_device="{device}",
+    train_device="{device}",
+    loggers=[],
+    create_json=False,
+    checkpoint_interval=0,
+    evaluation=False,
+    max_n_iters=1,
+    max_n_frames=None,
+    on_policy_collected_frames_per_batch={frames},
+    off_policy_collected_frames_per_batch={frames},
+)
+task = task_config_registry["{task}"]
+task.update_config(_load_config("{task}", {{}}))
+experiment = Experiment(
+    task=task,
+    algorithm_config=algorithm_config_registry["{algorithm}"](),
+    model_config=model_config_registry["{model}"](),
+    seed=0,
+    config=config,
+)
+
+setup = time.perf_counter()
+
+next(iter(experiment.collector))
+
+first_step = time.perf_counter()
+experiment.close()
+
+print(
+    json.dumps(
+        {{
+            "import": imported - start,
+            "setup": setup - start,
+            "first_step": first_step - start,
+        }}
+    )
+)
+"""
+
+
+def _run_child(code: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--task", type=str, default="vmas.balance")
+    parser.add_argument("--algorithm", type=str, default="mappo")
+    parser.add_argument("--model", type=str, default="mlp")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    code = _CHILD.format(
+        task=args.task,
+        algorithm=args.algorithm,
+        model=args.model,
+        device=args.device,
+        frames=args.frames,
+    )
+    runs = [_run_child(code) for _ in range(args.repeats)]
+    results = {
+        "task": args.task,
+        "algorithm": args.algorithm,
+        "model": args.model,
+        "device": args.device,
+        "repeats": args.repeats,
+        **{
+            f"{stage}_s": statistics.median(run[stage] for run in runs)
+            for stage in runs[0].keys()
+        },
+    }
+    print(json.dumps(results, indent=4))
@@ -0,0 +1,74 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+"""Generates ``benchmarl/conf/environment/task_index.py``.
+
+The index maps every "envname.task_name" key to the import path of its task enum member and
+of its ``TaskConfig`` dataclass, so that tasks can be looked up without importing every
+environment or walking the conf tree. Run this script after adding a task or an environment.
+"""
+
+import importlib
+import inspect
+import pkgutil
+from pathlib import Path
+
+import benchmarl.conf.environment as environment
+from benchmarl.conf.environment import Task
+
+INDEX_FILE = Path(environment.__file__).parent / "task_index.py"
+
+HEADER = """#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  This source code is licensed under the license found in the
+#  LICENSE file in the root directory of this source tree.
+#
+
+# This file is generated by scripts/generate_task_index.py, do not edit it manually.
+"""
+
+
+def generate_index():
+    task_enums = {}
+    task_configs = {}
+    for module_info in sorted(pkgutil.iter_modules(environment.__path__)):
+        if not module_info.ispkg:
+            continue
+        env_module_name = f"{environment.__name__}.{module_info.name}"
+        env_module = importlib.import_module(env_module_name)
+        for enum_name, enum_class in inspect.getmembers(env_module, inspect.isclass):
+            if not issubclass(enum_class, Task) or enum_class.__module__ != (
+                env_module_name
+            ):
+                continue
+            for task in enum_class:
+                key = f"{enum_class.env_name()}.{task.name.lower()}"
+                task_enums[key] = f"{env_module_name}.{enum_name}.{task.name}"
+                config_module = f"{env_module_name}.{task.name.lower()}"
+                if importlib.util.find_spec(config_module) is not None:
+                    task_configs[key] = f"{config_module}.TaskConfig"
+    return task_enums, task_configs
+
+
+def _format_dict(name, dictionary):
+    lines = [f"{name} = {{"]
+    lines += [f'    "{key}": "{value}",' for key, value in dictionary.items()]
+    lines.append("}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    task_enums, task_configs = generate_index()
+    with open(INDEX_FILE, "w") as f:
+        f.write(HEADER)
+        f.write("\n# Maps task keys to the import path of their task enum member\n")
+        f.write(_format_dict("TASK_ENUMS", task_enums))
+        f.write(
+            "\n\n# Maps task keys to the import path of their TaskConfig dataclass\n"
+        )
+        f.write(_format_dict("TASK_CONFIGS", task_configs))
+        f.write("\n")
+    print(f"Indexed {len(task_enums)} tasks in {INDEX_FILE}")